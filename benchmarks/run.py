@@ -0,0 +1,326 @@
+"""Benchmark suite: import, API endpoints, report/view builds and peak RSS.
+
+The suite writes a synthetic history (see synthetic.py) to a scratch
+directory as patient_bp.db, then runs each benchmark in its own process with
+that directory as the working directory, so every process's peak RSS is its
+own. Results are printed or written as JSON and can be compared against a
+stored baseline:
+
+    python -m benchmarks.run [--years M] [--output results.json]
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+Comparison exits with status 1 if any benchmark got slower or bigger than the
+baseline by more than --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def timed_loop(func, iterations):
+    """Median and 95th percentile seconds of repeated calls"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'seconds': statistics.median(samples),
+        'p95_seconds': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'iterations': iterations
+    }
+
+
+def timed_once(func):
+    # The build functions print progress; keep it out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func()
+    return {'seconds': time.perf_counter() - start}
+
+
+@benchmark('import_xlsx')
+def bench_import(args):
+    from benchmarks.synthetic import write_workbook
+    from bp.importer import import_workbook
+
+    write_workbook('bench.xlsx', seed=1, days=args.days)
+    if os.path.exists('import.db'):
+        os.remove('import.db')
+    result = timed_once(lambda: import_workbook('bench.xlsx', 'import.db'))
+
+    import sqlite3
+    conn = sqlite3.connect('import.db')
+    readings = conn.execute('SELECT COUNT(*) FROM blood_pressure_readings').fetchone()[0]
+    conn.close()
+    result['rows_per_second'] = readings / result['seconds']
+    return result
+
+
+def api_client():
+    from bp.app import app
+    return app.test_client()
+
+
+def last_date():
+    import sqlite3
+    from bp.db_schema import to_datetime_str
+    conn = sqlite3.connect('patient_bp.db')
+    ts = conn.execute('SELECT MAX(ts) FROM blood_pressure_readings').fetchone()[0]
+    conn.close()
+    return to_datetime_str(ts)[:10]
+
+
+def shift(date, days):
+    from datetime import date as date_type, timedelta
+    return (date_type.fromisoformat(date) + timedelta(days=days)).isoformat()
+
+
+def day_payload(client, date):
+    """A day's current contents in the shape the edit page posts"""
+    data = client.get(f'/api/data/{date}').get_json()
+    return {
+        'version': data['version'],
+        'bp_readings': [{'datetime': r[0], 'systolic': r[1], 'diastolic': r[2], 'heart_rate': r[3]}
+                        for r in data['bp_readings']],
+        'medications': [{'datetime': m[0], 'medication': m[1], 'dosage': m[2]}
+                        for m in data['medications']]
+    }
+
+
+@benchmark('api_all')
+def bench_api_all(args):
+    client = api_client()
+    return timed_loop(lambda: client.get('/api/data/all'), args.iterations)
+
+
+@benchmark('api_day')
+def bench_api_day(args):
+    client = api_client()
+    date = last_date()
+    return timed_loop(lambda: client.get(f'/api/data/{date}'), args.iterations)
+
+
+@benchmark('api_range_30d')
+def bench_api_range(args):
+    client = api_client()
+    end = last_date()
+    url = f'/api/data/range?start={shift(end, -29)}&end={end}'
+    return timed_loop(lambda: client.get(url), args.iterations)
+
+
+@benchmark('api_save_day')
+def bench_api_save_day(args):
+    client = api_client()
+    date = last_date()
+    payload = day_payload(client, date)
+
+    def save():
+        payload['version'] = client.post(f'/api/data/{date}', json=payload).get_json()['version']
+    return timed_loop(save, args.iterations)
+
+
+@benchmark('api_batch_7d')
+def bench_api_batch(args):
+    client = api_client()
+    end = last_date()
+    payload = {'days': {shift(end, -i): day_payload(client, shift(end, -i)) for i in range(7)}}
+
+    def save():
+        results = client.post('/api/data/batch', json=payload).get_json()['days']
+        for date, result in results.items():
+            payload['days'][date]['version'] = result['version']
+    return timed_loop(save, args.iterations)
+
+
+@benchmark('api_ingest')
+def bench_api_ingest(args):
+    from bp import app
+    app.start_ingest()
+    client = api_client()
+    end = last_date()
+    counter = iter(range(10 ** 9))
+
+    def submit():
+        i = next(counter)
+        readings = [{'datetime': f'{shift(end, 1 + i // 100)} {7 + j:02d}:{i % 60:02d}:00',
+                     'systolic': 120, 'diastolic': 80, 'heart_rate': 70} for j in range(10)]
+        client.post('/api/readings', json={'readings': readings})
+    result = timed_loop(submit, args.iterations)
+    app.ingest_queue.drain()
+    return result
+
+
+@benchmark('api_profile_90d')
+def bench_api_profile(args):
+    client = api_client()
+    end = last_date()
+    url = f'/api/profile?start={shift(end, -89)}&end={end}'
+    return timed_loop(lambda: client.get(url), args.iterations)
+
+
+@benchmark('api_xcorr_cold')
+def bench_api_cross_correlation_cold(args):
+    client = api_client()
+    shutil.rmtree('.column_cache', ignore_errors=True)
+    return timed_once(lambda: client.get('/api/cross-correlation'))
+
+
+@benchmark('api_xcorr_warm')
+def bench_api_cross_correlation_warm(args):
+    client = api_client()
+    client.get('/api/cross-correlation')
+    return timed_loop(lambda: client.get('/api/cross-correlation'), args.iterations)
+
+
+@benchmark('api_metrics')
+def bench_api_metrics(args):
+    client = api_client()
+    client.get('/api/data/all')
+    return timed_loop(lambda: client.get('/metrics'), args.iterations)
+
+
+@benchmark('report_cold')
+def bench_report_cold(args):
+    from bp.report import generate_report
+    shutil.rmtree('.column_cache', ignore_errors=True)
+    return timed_once(lambda: generate_report(os.devnull))
+
+
+@benchmark('report_warm')
+def bench_report_warm(args):
+    from bp.report import generate_report
+    timed_once(lambda: generate_report(os.devnull))
+    return timed_once(lambda: generate_report(os.devnull))
+
+
+@benchmark('view_cold')
+def bench_view_cold(args):
+    from bp.windowed_view import generate_view
+    shutil.rmtree('.column_cache', ignore_errors=True)
+    return timed_once(lambda: generate_view(os.devnull))
+
+
+@benchmark('view_warm')
+def bench_view_warm(args):
+    from bp.windowed_view import generate_view
+    timed_once(lambda: generate_view(os.devnull))
+    return timed_once(lambda: generate_view(os.devnull))
+
+
+def run_worker(name, args):
+    """Run one benchmark in this process and print its result as JSON"""
+    result = BENCHMARKS[name](args)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    print(json.dumps(result))
+
+
+def run_suite(args):
+    from benchmarks.synthetic import write_database
+
+    workdir = tempfile.mkdtemp(prefix='bp-bench-')
+    try:
+        readings = write_database(os.path.join(workdir, 'patient_bp.db'), seed=0, days=args.days)
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        results = {}
+        for name in args.only or BENCHMARKS:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.run', '--worker', name,
+                 '--days', str(args.days), '--iterations', str(args.iterations)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+            print(f"  {name:<16} {results[name]['seconds'] * 1000:>9.1f} ms "
+                  f"{results[name]['peak_rss_mb']:>7.1f} MB", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'days': args.days,
+            'readings': readings,
+            'iterations': args.iterations,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Print changes against the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"{'benchmark':<16} {'baseline ms':>12} {'now ms':>10} {'ratio':>7} {'rss ratio':>10}")
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<16} {'-':>12} {result['seconds'] * 1000:>10.1f}")
+            continue
+        ratio = result['seconds'] / base['seconds']
+        rss_ratio = result['peak_rss_mb'] / base['peak_rss_mb']
+        regressed = ratio > 1 + tolerance or rss_ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<16} {base['seconds'] * 1000:>12.1f} {result['seconds'] * 1000:>10.1f} "
+              f"{ratio:>7.2f} {rss_ratio:>10.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--years', type=float, default=1, help='length of the synthetic history')
+    parser.add_argument('--days', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--iterations', type=int, default=20, help='requests per API benchmark')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS))
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--baseline', help='compare against this results JSON')
+    parser.add_argument('--save-baseline', help='write the results JSON as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown/growth before a benchmark counts as regressed')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.days is None:
+        args.days = int(args.years * 365)
+
+    if args.worker:
+        run_worker(args.worker, args)
+        sys.exit(0)
+
+    report = run_suite(args)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+    if not (args.output or args.save_baseline):
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,66 @@
+"""Startup cost of `bp` commands, measured with `python -X importtime`.
+
+For each command, runs `python -X importtime -m bp <command>` a few times and
+reports the median wall time, the total import time and which heavy
+dependencies were loaded. Run from the directory holding patient_bp.db:
+
+    python benchmarks/startup_time.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['pandas', 'plotly', 'flask', 'openpyxl', 'pyarrow', 'numpy']
+
+# Light commands first, then the report for comparison (written to the null device)
+COMMANDS = [
+    ['--help'],
+    ['stats'],
+    ['stats', '--days', '7'],
+    ['serve', '--help'],
+    ['report', '-o', os.devnull],
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """Top-level modules and total import time (us) from -X importtime output"""
+    imported = set()
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only un-nested entries count toward the total, nested ones are included
+        if not name.startswith('  '):
+            total += int(cumulative)
+        imported.add(name.strip().split('.')[0])
+    return imported, total
+
+
+def measure(command, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    walls = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'bp'] + command,
+                                capture_output=True, text=True, env=env)
+        walls.append(time.perf_counter() - start)
+    imported, total = parse_importtime(result.stderr)
+    return statistics.median(walls), total, [m for m in HEAVY_MODULES if m in imported]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'command':<24} {'wall ms':>8} {'import ms':>10}  heavy modules")
+    for command in COMMANDS:
+        wall, total, heavy = measure(command, args.runs)
+        print(f"{'bp ' + ' '.join(command):<24} {wall * 1000:>8.0f} {total / 1000:>10.0f}  "
+              f"{', '.join(heavy) or '-'}")
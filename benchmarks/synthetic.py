@@ -0,0 +1,154 @@
+"""Synthetic patient histories for benchmarks.
+
+Readings fall on the workbook's 31 half-hour slots (06:30-21:30). Each slot is
+filled with a fixed probability; values follow a mild daily curve with noise,
+and the three medications are taken on a fixed schedule. Everything comes
+from a seeded generator, so the same arguments always give the same data.
+
+    python -m benchmarks.synthetic DIR [--patients N] [--years M] [--xlsx]
+
+writes DIR/patient_<i>.db (and DIR/patient_<i>.xlsx in the import layout).
+"""
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+from bp.alert_rules import record_alerts
+from bp.anomaly import rebuild_anomalies
+from bp.db_schema import ensure_schema, to_epoch
+from bp.medication_schedule import merge_doses
+from bp.profile_cube import rebuild_profile_cube
+
+# 06:30, 07:00, ..., 21:30, the rows of source.xlsx
+SLOTS = [time(6, 30)] + [time(hour, minute) for hour in range(7, 22) for minute in (0, 30)]
+
+# Column order of one date block in the workbook
+METRIC_NAMES = ['收缩压', '舒张压', '心跳', '坎地沙坦', '乐卡地平', '美托洛尔']
+
+# (medication name, workbook column within a date block, slot times, dosage)
+MEDICATION_SCHEDULE = [
+    ('坎地沙坦 (Candesartan)', 3, [time(8, 30)], 0.25),
+    ('乐卡地平 (Lercanidipine)', 4, [time(20, 30)], 0.5),
+    ('美托洛尔 (Metoprolol)', 5, [time(8, 30), time(20, 30)], 0.5),
+]
+
+# Share of slots with a reading; about 13 readings a day, like the sample data
+READING_PROBABILITY = 0.42
+
+
+def day_readings(rng, day):
+    """(datetime string, systolic, diastolic, heart_rate) rows for one day"""
+    filled = rng.random(len(SLOTS)) < READING_PROBABILITY
+    hours = np.array([slot.hour + slot.minute / 60 for slot in SLOTS])
+    # Higher in the morning, dipping in the afternoon
+    curve = 6 * np.cos((hours - 8) / 24 * 2 * np.pi)
+    systolic = np.rint(116 + curve + rng.normal(0, 11, len(SLOTS)))
+    diastolic = np.rint(64 + curve / 2 + rng.normal(0, 6, len(SLOTS)))
+    heart_rate = np.rint(rng.normal(79, 8, len(SLOTS)))
+    # Heart rate is sometimes not taken
+    has_heart_rate = rng.random(len(SLOTS)) < 0.8
+
+    rows = []
+    for i, slot in enumerate(SLOTS):
+        if filled[i]:
+            rows.append((f'{day} {slot}', int(systolic[i]), int(diastolic[i]),
+                         int(heart_rate[i]) if has_heart_rate[i] else None))
+    return rows
+
+
+def day_medications(day):
+    """(datetime string, medication, dosage) rows for one day"""
+    return [(f'{day} {slot}', name, dosage)
+            for name, _, slots, dosage in MEDICATION_SCHEDULE for slot in slots]
+
+
+def history(seed, days, start=date(2024, 1, 1)):
+    """Yield (day, readings, medications) for consecutive days"""
+    rng = np.random.default_rng(seed)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        yield day, day_readings(rng, day), day_medications(day)
+
+
+def write_database(path, seed, days):
+    """Create a database in the current schema; returns the number of readings"""
+    conn = sqlite3.connect(path)
+    ensure_schema(conn)
+    cursor = conn.cursor()
+    count = 0
+    doses = []
+    for _, readings, medications in history(seed, days):
+        rows = [(to_epoch(dt), *values) for dt, *values in readings]
+        cursor.executemany('''
+            INSERT OR REPLACE INTO blood_pressure_readings (ts, systolic_bp, diastolic_bp, heart_rate)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+        record_alerts(cursor, rows)
+        doses.extend((to_epoch(dt), name, dosage) for dt, name, dosage in medications)
+        count += len(rows)
+    merge_doses(cursor, doses)
+    rebuild_profile_cube(conn)
+    rebuild_anomalies(conn)
+    conn.commit()
+    conn.close()
+    return count
+
+
+def write_workbook(path, seed, days):
+    """Write the same history as an Excel sheet in the import layout"""
+    from openpyxl import Workbook
+
+    days_data = list(history(seed, days))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    # Row 1: each date over its six columns; row 2: the metric names
+    header, names = [None], [None]
+    for day, _, _ in days_data:
+        header.extend([datetime.combine(day, time())] * len(METRIC_NAMES))
+        names.extend(METRIC_NAMES)
+    ws.append(header)
+    ws.append(names)
+
+    # One block of six cells per date for each slot
+    blocks = []
+    for day, readings, _ in days_data:
+        by_slot = {dt.split(' ')[1]: values for dt, *values in readings}
+        block = {}
+        for slot in SLOTS:
+            values = by_slot.get(str(slot), [None, None, None])
+            block[slot] = list(values) + [None, None, None]
+        for _, column, slots, dosage in MEDICATION_SCHEDULE:
+            for slot in slots:
+                block[slot][column] = dosage
+        blocks.append(block)
+
+    for slot in SLOTS:
+        row = [slot]
+        for block in blocks:
+            row.extend(block[slot])
+        ws.append(row)
+    wb.save(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic patient data')
+    parser.add_argument('directory')
+    parser.add_argument('--patients', type=int, default=1)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--xlsx', action='store_true', help='also write import-layout workbooks')
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    days = int(args.years * 365)
+    for patient in range(args.patients):
+        db_path = os.path.join(args.directory, f'patient_{patient}.db')
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        count = write_database(db_path, seed=patient, days=days)
+        print(f"✓ {db_path}: {count} readings over {days} days")
+        if args.xlsx:
+            write_workbook(os.path.join(args.directory, f'patient_{patient}.xlsx'), seed=patient, days=days)
@@ -0,0 +1,4 @@
+"""Blood pressure tracking: SQLite storage, reports and a live dashboard.
+
+Kept free of imports so that `bp` subcommands only load what they use.
+"""
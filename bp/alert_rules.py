@@ -0,0 +1,151 @@
+"""Configurable alert rules evaluated on ingest.
+
+Rules live in alert_rules.json. Each rule has a name, a group ('alert' rules
+drive the red highlights and alert counts, 'aha' the blood pressure
+classification, 'heart_rate' the heart rate limits) and either an "all" or an
+"any" list of [metric, operator, value] conditions. Rules are compiled once to
+NumPy predicates over whole columns, and every reading that matches a rule is
+stored in the alerts table, so counts and highlights become indexed lookups.
+
+Run this module directly to rebuild the alerts table after editing the rules.
+"""
+import json
+import os
+import sqlite3
+from functools import lru_cache
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+RULES_PATH = os.path.join(BASE_DIR, 'alert_rules.json')
+
+METRICS = ['systolic_bp', 'diastolic_bp', 'heart_rate']
+
+# NumPy ufunc names, resolved when a predicate runs: reading the rules (e.g. for
+# `bp stats`) does not need NumPy
+OPERATORS = {
+    '>': 'greater',
+    '>=': 'greater_equal',
+    '<': 'less',
+    '<=': 'less_equal',
+    '==': 'equal',
+    '!=': 'not_equal',
+}
+
+
+def compile_rule(rule):
+    """Turn a rule's conditions into a predicate over a dict of column arrays"""
+    combine = 'logical_and' if 'all' in rule else 'logical_or'
+    conditions = [(metric, OPERATORS[op], value)
+                  for metric, op, value in rule.get('all') or rule['any']]
+
+    def predicate(columns):
+        import numpy as np
+
+        result = None
+        # Missing values (NaN) never match a condition
+        with np.errstate(invalid='ignore'):
+            for metric, op, value in conditions:
+                mask = getattr(np, op)(columns[metric], value)
+                result = mask if result is None else getattr(np, combine)(result, mask)
+        return result
+
+    return predicate
+
+
+@lru_cache(maxsize=None)
+def load_rules(path=RULES_PATH):
+    """Load and compile the rules once per process"""
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    return [dict(rule, predicate=compile_rule(rule)) for rule in rules]
+
+
+def client_rules():
+    """Rule definitions without the compiled predicates, for the JSON payloads"""
+    return [{k: v for k, v in rule.items() if k != 'predicate'} for rule in load_rules()]
+
+
+def rules_in_group(group):
+    return [rule for rule in load_rules() if rule['group'] == group]
+
+
+def threshold(rule_name, metric):
+    """Value of the first condition a rule places on a metric (for chart guides)"""
+    for rule in load_rules():
+        if rule['name'] == rule_name:
+            for cond_metric, _, value in rule.get('all') or rule['any']:
+                if cond_metric == metric:
+                    return value
+    raise KeyError(f'{rule_name} has no condition on {metric}')
+
+
+def evaluate(rows):
+    """Match (ts, systolic, diastolic, heart_rate) rows against every rule.
+
+    Returns (ts, rule name) pairs for the alerts table.
+    """
+    import numpy as np
+
+    if not rows:
+        return []
+    times = np.array([row[0] for row in rows], dtype=np.int64)
+    values = np.array([row[1:4] for row in rows], dtype=float)
+    columns = {metric: values[:, i] for i, metric in enumerate(METRICS)}
+
+    matches = []
+    for rule in load_rules():
+        for ts in times[rule['predicate'](columns)].tolist():
+            matches.append((ts, rule['name']))
+    return matches
+
+
+def ensure_alerts_table(conn):
+    """Create the alerts table, filling it from existing readings on first use"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            ts INTEGER NOT NULL,
+            rule TEXT NOT NULL,
+            PRIMARY KEY (ts, rule)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_rule ON alerts (rule, ts)')
+
+    if not exists:
+        rebuild_alerts(conn)
+    conn.commit()
+
+
+def record_alerts(cursor, rows):
+    """Evaluate newly written readings and store their alerts"""
+    cursor.executemany('INSERT OR REPLACE INTO alerts (ts, rule) VALUES (?, ?)',
+                       evaluate(rows))
+
+
+def rebuild_alerts(conn):
+    """Re-evaluate every reading, e.g. after the rules have changed"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM alerts')
+    cursor.execute('''
+        SELECT ts, systolic_bp, diastolic_bp, heart_rate
+        FROM blood_pressure_readings
+    ''')
+    record_alerts(cursor, cursor.fetchall())
+
+
+if __name__ == '__main__':
+    from .db_schema import DB_PATH, ensure_schema
+
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    rebuild_alerts(conn)
+    conn.commit()
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT rule, COUNT(*) FROM alerts GROUP BY rule ORDER BY rule')
+    print("✓ Alerts rebuilt from alert_rules.json")
+    for rule, count in cursor.fetchall():
+        print(f"  - {rule}: {count} readings")
+    conn.close()
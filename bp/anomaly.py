@@ -0,0 +1,239 @@
+"""Streaming anomaly scores: how far a reading is from the patient's own baseline.
+
+anomaly_state keeps, for each metric and half-hour time-of-day slot, an
+exponentially weighted moving average (the current baseline) and Welford's
+running count, mean and sum of squared deviations (the spread). A new
+reading is scored against its slot's state as it is before the reading,
+
+    z = (value - ewma) / standard deviation
+
+and then folded in, so scoring costs one state row per metric whatever the
+length of the history. A slot needs MIN_BASELINE readings before it scores.
+Each scored reading gets a row in anomaly_scores with its per-metric z and
+`score`, the largest |z|; readings scoring at least ANOMALY_Z are flagged.
+
+Writers call rescore_changed() with the readings a write replaced and the
+ones it stored. Replaced and deleted values are taken back out of the Welford
+count, mean and spread exactly; the moving average cannot be unwound, so
+under edits it is approximate (the old value's weight decays as new readings
+arrive). Readings arrive in any order, e.g. an edit to an old day, and are
+folded in as they arrive; rebuild_anomalies() replays the whole history in
+time order. It only runs on demand (`bp anomalies --rebuild`, or running this
+module), never per request.
+"""
+import math
+import sqlite3
+
+from .profile_cube import SLOT_SECONDS
+
+METRICS = ['systolic_bp', 'diastolic_bp', 'heart_rate']
+# Weight of a new reading in its slot's moving average (~ the last 20 readings)
+EWMA_ALPHA = 0.1
+MIN_BASELINE = 10
+ANOMALY_Z = 3.0
+# Readings folded in per batch when rebuilding
+REBUILD_BATCH = 10000
+
+# Largest |z| of a reading, for the API rows (readings aliased as r)
+SCORE_SQL = '(SELECT score FROM anomaly_scores s WHERE s.ts = r.ts)'
+
+
+def ensure_anomaly_tables(conn):
+    """Create the state and score tables, scoring existing readings on first use"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'anomaly_state'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS anomaly_state (
+            metric TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            m2 REAL NOT NULL,
+            ewma REAL NOT NULL,
+            PRIMARY KEY (metric, slot)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS anomaly_scores (
+            ts INTEGER PRIMARY KEY,
+            systolic_z REAL,
+            diastolic_z REAL,
+            heart_rate_z REAL,
+            score REAL
+        ) WITHOUT ROWID
+    ''')
+
+    if not exists:
+        rebuild_anomalies(conn)
+    conn.commit()
+
+
+def update(state, value):
+    """Score a value against (count, mean, m2, ewma), then fold it in"""
+    count, mean, m2, ewma = state
+    z = None
+    if count >= MIN_BASELINE and m2 > 0:
+        z = (value - ewma) / math.sqrt(m2 / (count - 1))
+
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    ewma = value if count == 1 else ewma + EWMA_ALPHA * (value - ewma)
+    return z, (count, mean, m2, ewma)
+
+
+def remove(state, value):
+    """Take a value folded in by update() back out of (count, mean, m2, ewma).
+
+    Exact for the count, mean and m2; the EWMA is left as it is.
+    """
+    count, mean, m2, ewma = state
+    if count <= 1:
+        return (0, 0.0, 0.0, 0.0)
+    count -= 1
+    previous_mean = mean
+    mean -= (value - mean) / count
+    m2 = max(0.0, m2 - (value - previous_mean) * (value - mean))
+    return (count, mean, m2, ewma)
+
+
+def load_states(cursor, rows):
+    """State rows of the slots of the given readings, keyed by (metric, slot)"""
+    slots = sorted({row[0] % 86400 // SLOT_SECONDS for row in rows})
+    if not slots:
+        return {}
+    cursor.execute(f'''
+        SELECT metric, slot, count, mean, m2, ewma
+        FROM anomaly_state
+        WHERE slot IN ({', '.join('?' * len(slots))})
+    ''', slots)
+    return {(metric, slot): tuple(state) for metric, slot, *state in cursor.fetchall()}
+
+
+def save_states(cursor, states):
+    cursor.executemany('''
+        INSERT OR REPLACE INTO anomaly_state (metric, slot, count, mean, m2, ewma)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(metric, slot, *state) for (metric, slot), state in states.items()])
+
+
+def stored_readings(cursor, bounds):
+    """The readings in each [start, end) range, as a set of rows"""
+    rows = set()
+    for start, end in bounds:
+        cursor.execute('''
+            SELECT ts, systolic_bp, diastolic_bp, heart_rate
+            FROM blood_pressure_readings
+            WHERE ts >= ? AND ts < ?
+        ''', (start, end))
+        rows.update(cursor.fetchall())
+    return rows
+
+
+def score_readings(cursor, rows, fold=True):
+    """Score new (ts, systolic, diastolic, heart_rate) rows and update the state.
+
+    With fold=False the rows are scored against the state without changing
+    it, for readings it already holds (restored from an archive).
+    """
+    rows = sorted(rows)
+    if not rows:
+        return
+    states = load_states(cursor, rows)
+
+    scores = []
+    for row in rows:
+        slot = row[0] % 86400 // SLOT_SECONDS
+        z_values = []
+        for metric, value in zip(METRICS, row[1:4]):
+            z = None
+            if value is not None:
+                z, state = update(states.get((metric, slot), (0, 0.0, 0.0, 0.0)), value)
+                if fold:
+                    states[metric, slot] = state
+            z_values.append(None if z is None else round(z, 2))
+        present = [abs(z) for z in z_values if z is not None]
+        scores.append((row[0], *z_values, max(present) if present else None))
+
+    if fold:
+        save_states(cursor, states)
+    cursor.executemany('''
+        INSERT OR REPLACE INTO anomaly_scores (ts, systolic_z, diastolic_z, heart_rate_z, score)
+        VALUES (?, ?, ?, ?, ?)
+    ''', scores)
+
+
+def unscore_readings(cursor, rows):
+    """Take replaced or deleted readings out of the state and drop their scores"""
+    if not rows:
+        return
+    states = load_states(cursor, rows)
+    for row in rows:
+        slot = row[0] % 86400 // SLOT_SECONDS
+        for metric, value in zip(METRICS, row[1:4]):
+            if value is not None and (metric, slot) in states:
+                states[metric, slot] = remove(states[metric, slot], value)
+    save_states(cursor, states)
+    cursor.executemany('DELETE FROM anomaly_scores WHERE ts = ?', [(row[0],) for row in rows])
+
+
+def rescore_changed(cursor, previous, rows):
+    """Update the state and scores after `previous` readings were replaced by `rows`.
+
+    Unchanged readings keep their score and their place in the state;
+    readings that changed or are gone are taken out before the new values
+    are folded in, so saving a day again does not count it twice.
+    """
+    unscore_readings(cursor, previous - set(rows))
+    score_readings(cursor, [row for row in rows if row not in previous])
+
+
+def rebuild_anomalies(conn):
+    """Replay every reading in time order into fresh state and scores"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM anomaly_state')
+    cursor.execute('DELETE FROM anomaly_scores')
+
+    reader = conn.cursor()
+    reader.execute('''
+        SELECT ts, systolic_bp, diastolic_bp, heart_rate
+        FROM blood_pressure_readings
+        ORDER BY ts
+    ''')
+    while True:
+        rows = reader.fetchmany(REBUILD_BATCH)
+        if not rows:
+            break
+        score_readings(cursor, rows)
+
+
+def flagged_readings(cursor, limit=20):
+    """The most recent readings scoring at least ANOMALY_Z"""
+    cursor.execute('''
+        SELECT datetime(s.ts, 'unixepoch'), systolic_bp, diastolic_bp, heart_rate,
+               systolic_z, diastolic_z, heart_rate_z
+        FROM anomaly_scores s
+        JOIN blood_pressure_readings r ON r.ts = s.ts
+        WHERE score >= ?
+        ORDER BY s.ts DESC
+        LIMIT ?
+    ''', (ANOMALY_Z, limit))
+    return cursor.fetchall()
+
+
+if __name__ == '__main__':
+    from .db_schema import DB_PATH, ensure_schema
+
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    rebuild_anomalies(conn)
+    conn.commit()
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*), COUNT(score), SUM(score >= ?) FROM anomaly_scores', (ANOMALY_Z,))
+    readings, scored, flagged = cursor.fetchone()
+    print(f"✓ Anomaly scores rebuilt: {scored} of {readings} readings scored, {flagged or 0} flagged")
+    conn.close()
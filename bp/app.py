@@ -0,0 +1,570 @@
+from flask import Flask, Response, request, send_from_directory
+from flask import jsonify as flask_jsonify
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+import os
+import queue
+import threading
+from .daily_index import load_daily_index, load_day_totals
+from .alert_rules import client_rules, record_alerts
+from .anomaly import ANOMALY_Z, SCORE_SQL, rescore_changed, stored_readings
+from .db_schema import (DB_PATH, archived_before, bump_day_versions, date_to_day, day_range,
+                        ensure_schema, load_day_versions, to_datetime_str, to_epoch)
+from .hot_snapshot import HOT_DAYS
+from .ingest import IngestQueue, IngestStopped
+from .medication_schedule import load_doses, replace_days
+from .live_updates import broadcaster, diff_rows
+from .profile_cube import load_profile, profile_stats, refresh_months, slot_label
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+WEB_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'web')
+# Upper bound on the days one /api/data/range request may cover
+MAX_RANGE_DAYS = 366
+# Write-ahead log of /api/readings uploads not yet committed, next to the database
+INGEST_LOG_PATH = 'ingest.log'
+MAX_INGEST_READINGS = 1000
+# Serializes this process's column cache builds for the analysis endpoints
+analysis_lock = threading.Lock()
+# Hot response bodies shared by pre-forked workers (prefork.py); None in a single process
+hot_snapshot = None
+# This process's device reading queue, see start_ingest
+ingest_queue = None
+ingest_lock = threading.RLock()
+
+def init_db():
+    """Bring older databases up to the current schema (epoch keys, alerts table)"""
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    # Write-ahead logging lets readers keep reading while a save commits;
+    # the setting is stored in the database file
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+
+init_db()
+
+def jsonify(*args, **kwargs):
+    """flask.jsonify, timed as the request's serialize stage"""
+    with metrics.stage('serialize'):
+        return flask_jsonify(*args, **kwargs)
+
+@app.before_request
+def start_timing():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.begin_request(f'{request.method} {rule}')
+
+@app.after_request
+def record_timing(response):
+    metrics.end_request(response.status_code, response.content_length)
+    return response
+
+def fetch_day(cursor, date):
+    """BP readings (with the alert rules they matched and anomaly score) and medications for one date"""
+    cursor.execute(f'''
+        SELECT datetime(ts, 'unixepoch'), systolic_bp, diastolic_bp, heart_rate,
+               (SELECT group_concat(rule) FROM alerts a WHERE a.ts = r.ts),
+               {SCORE_SQL}
+        FROM blood_pressure_readings r
+        WHERE ts >= ? AND ts < ?
+        ORDER BY ts
+    ''', day_range(date))
+    bp_records = cursor.fetchall()
+
+    med_records = medication_records(cursor, *day_range(date))
+
+    return bp_records, med_records
+
+def medication_records(cursor, start=None, end=None):
+    """(datetime, medication, dosage) rows of the doses in [start, end), from the schedules"""
+    return [(to_datetime_str(ts), name, dosage) for ts, name, dosage in load_doses(cursor, start, end)]
+
+@app.route('/')
+def index():
+    return send_from_directory(WEB_DIR, 'bp_windowed_view.html')
+
+@app.route('/edit')
+def edit():
+    return send_from_directory(WEB_DIR, 'edit_data.html')
+
+@app.route('/bp_window_worker.js')
+def window_worker():
+    return send_from_directory(WEB_DIR, 'bp_window_worker.js')
+
+def snapshot_response(key):
+    """The hot snapshot's body for key as a response, or None to answer from SQLite"""
+    body = hot_snapshot.body(key) if hot_snapshot else None
+    if body is None:
+        return None
+    return Response(body, mimetype='application/json')
+
+def all_data(conn):
+    """All BP readings and medications, with the daily index"""
+    cursor = conn.cursor()
+
+    # Fetch all BP readings with the names of the rules each one matched and
+    # their anomaly score
+    cursor.execute(f'''
+        SELECT datetime(ts, 'unixepoch'), systolic_bp, diastolic_bp, heart_rate,
+               (SELECT group_concat(rule) FROM alerts a WHERE a.ts = r.ts),
+               {SCORE_SQL}
+        FROM blood_pressure_readings r
+        ORDER BY ts
+    ''')
+    bp_records = cursor.fetchall()
+
+    # Expand all medication schedules
+    med_records = medication_records(cursor)
+
+    # Cumulative per-day totals for constant-time window statistics
+    daily_index = load_daily_index(conn)
+
+    return {
+        'bp_readings': bp_records,
+        'medications': med_records,
+        'daily_index': daily_index,
+        'alert_rules': client_rules(),
+        'anomaly_threshold': ANOMALY_Z
+    }
+
+def day_data(cursor, date):
+    """All records for a specific date, with the version the day was loaded at"""
+    bp_records, med_records = fetch_day(cursor, date)
+    day = date_to_day(date)
+    version = load_day_versions(cursor, day, day).get(day, 0)
+
+    # The version is sent back when saving, see write_days
+    return {
+        'bp_readings': bp_records,
+        'medications': med_records,
+        'version': version
+    }
+
+def hot_bodies(conn):
+    """Response bodies for the hot snapshot: all data and the last HOT_DAYS days with readings"""
+    with app.app_context():
+        payload = all_data(conn)
+        bodies = {'all': app.json.response(payload).get_data()}
+        for date in payload['daily_index']['dates'][-HOT_DAYS:]:
+            bodies[f'day:{date}'] = app.json.response(day_data(conn.cursor(), date)).get_data()
+    return bodies
+
+@app.route('/api/data/all', methods=['GET'])
+def get_all_data():
+    """Get all BP readings and medications"""
+    response = snapshot_response('all')
+    if response is not None:
+        return response
+
+    conn = metrics.connect(DB_PATH)
+    payload = all_data(conn)
+    conn.close()
+    return jsonify(payload)
+
+@app.route('/api/data/<date>', methods=['GET'])
+def get_data(date):
+    """Get all records for a specific date"""
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+
+    response = snapshot_response(f'day:{date}')
+    if response is not None:
+        return response
+
+    conn = metrics.connect(DB_PATH)
+    payload = day_data(conn.cursor(), date)
+    conn.close()
+    return jsonify(payload)
+
+@app.route('/api/data/range', methods=['GET'])
+def get_range():
+    """Get all records for the dates start..end (inclusive), keyed by date"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d')
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d')
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if not 0 <= (end - start).days < MAX_RANGE_DAYS:
+        return jsonify({'error': f'range must cover 1 to {MAX_RANGE_DAYS} days'}), 400
+
+    conn = metrics.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Every date in the range gets an entry, so empty days can be cached too
+    first_day = date_to_day(request.args['start'])
+    versions = load_day_versions(cursor, first_day, first_day + (end - start).days)
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).strftime('%Y-%m-%d')
+        days[day] = {'bp_readings': [], 'medications': [],
+                     'version': versions.get(first_day + offset, 0)}
+
+    # One primary-key range scan for the readings, one expansion of the schedules
+    bounds = (day_range(request.args['start'])[0], day_range(request.args['end'])[1])
+    cursor.execute(f'''
+        SELECT datetime(ts, 'unixepoch'), systolic_bp, diastolic_bp, heart_rate,
+               (SELECT group_concat(rule) FROM alerts a WHERE a.ts = r.ts),
+               {SCORE_SQL}
+        FROM blood_pressure_readings r
+        WHERE ts >= ? AND ts < ?
+        ORDER BY ts
+    ''', bounds)
+    for row in cursor.fetchall():
+        days[row[0][:10]]['bp_readings'].append(row)
+
+    for row in medication_records(cursor, *bounds):
+        days[row[0][:10]]['medications'].append(row)
+
+    conn.close()
+
+    return jsonify({'days': days})
+
+@app.route('/api/profile', methods=['GET'])
+def get_profile():
+    """Time-of-day profile per half-hour slot over start..end (both optional, inclusive).
+
+    weekdays=1,2,... restricts it to days of the week (0 = Sunday). Built from
+    the profile cube, see profile_cube.py.
+    """
+    try:
+        for name in ('start', 'end'):
+            if name in request.args:
+                datetime.strptime(request.args[name], '%Y-%m-%d')
+        weekdays = None
+        if request.args.get('weekdays'):
+            weekdays = [int(day) for day in request.args['weekdays'].split(',')]
+            if not all(0 <= day <= 6 for day in weekdays):
+                raise ValueError
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD, weekdays a list of 0-6'}), 400
+
+    conn = metrics.connect(DB_PATH)
+    profile = load_profile(conn.cursor(), request.args.get('start'), request.args.get('end'), weekdays)
+    conn.close()
+
+    stats = profile_stats(profile)
+    stats['slots'] = [slot_label(slot) for slot in range(len(stats['systolic_bp']['count']))]
+    return jsonify(stats)
+
+@app.route('/api/cross-correlation', methods=['GET'])
+def get_cross_correlation():
+    """Correlation by lag of heart rate, BP and dose series (see cross_correlation.py)"""
+    # NumPy and pandas are only loaded once an analysis is asked for
+    from .column_cache import load_cache
+    from .cross_correlation import load_cross_correlations
+
+    # Computed once per data version; the lock keeps concurrent requests in
+    # this process from building the same version twice (builds in different
+    # processes are kept apart by load_cache itself)
+    with analysis_lock:
+        result = load_cross_correlations(load_cache(DB_PATH))
+    return jsonify(result)
+
+def day_rows(date, data):
+    """Validate one day's payload and turn it into rows to insert"""
+    datetime.strptime(date, '%Y-%m-%d')
+    start, end = day_range(date)
+
+    bp_rows = []
+    for record in data.get('bp_readings', []):
+        # Only insert if at least one field is not null
+        if record.get('systolic') or record.get('diastolic') or record.get('heart_rate'):
+            bp_rows.append((
+                to_epoch(record['datetime']),
+                record.get('systolic') or None,
+                record.get('diastolic') or None,
+                record.get('heart_rate') or None
+            ))
+
+    med_rows = []
+    for record in data.get('medications', []):
+        if record.get('dosage'):  # Only insert if dosage is provided
+            med_rows.append((to_epoch(record['datetime']), record['medication'], record['dosage']))
+
+    for row in bp_rows + med_rows:
+        if not start <= row[0] < end:
+            raise ValueError(f'{to_datetime_str(row[0])} is not on {date}')
+    if len({row[0] for row in bp_rows}) != len(bp_rows):
+        raise ValueError('duplicate BP reading times')
+    if len({row[:2] for row in med_rows}) != len(med_rows):
+        raise ValueError('duplicate medication times')
+
+    return bp_rows, med_rows
+
+def write_days(conn, days, source=None):
+    """Replace the given days in one transaction.
+
+    Each day's payload carries the version it was loaded at (from GET
+    /api/data/<date> or /api/data/range). Days whose payload is invalid, or
+    that were written by someone else since that version, are skipped and
+    reported; the rest are written with one executemany per statement and get
+    the next version. Returns the per-day results and the deltas to broadcast
+    once the transaction has committed.
+
+    Device readings committed by the ingest writer (ingest_rows) bump the
+    versions of their days like any other write. A day saved from a copy
+    loaded before such an ingest is therefore refused as a conflict, never
+    merged: the ingested readings are kept and the editor reloads the day
+    (the edit page asks first when it has unsaved entries) before saving
+    again.
+
+    Days before retention.archived_before are refused: their readings live
+    in the archive and their totals in daily_summaries (maintenance.py).
+    """
+    cursor = conn.cursor()
+    results = {}
+    rows = {}
+    expected = {}
+    for date, data in days.items():
+        try:
+            if not isinstance(data.get('version'), int):
+                raise ValueError('version (from loading the day) must be an integer')
+            rows[date] = day_rows(date, data)
+            expected[date] = data['version']
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            results[date] = {'success': False, 'error': str(e)}
+
+    # Take the write lock before reading the versions, so no other save can
+    # slip in between the check and the writes; readers are not blocked (WAL)
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cutoff = archived_before(cursor)
+        for date in list(rows):
+            if day_range(date)[0] < cutoff:
+                del rows[date]
+                results[date] = {'success': False, 'error': f'{date} is archived; restore it '
+                                                          'with `bp archive import` to edit it'}
+                continue
+            day = date_to_day(date)
+            version = load_day_versions(cursor, day, day).get(day, 0)
+            if version != expected[date]:
+                del rows[date]
+                results[date] = {'success': False, 'conflict': True, 'version': version,
+                                 'error': f'{date} was changed since version {expected[date]} was loaded'}
+
+        # Previous contents of each day, to broadcast only what changed
+        old = {date: fetch_day(cursor, date) for date in rows}
+        day_params = [day_range(date) for date in rows]
+        previous = stored_readings(cursor, day_params)
+
+        # Delete existing records for these dates
+        cursor.executemany('DELETE FROM blood_pressure_readings WHERE ts >= ? AND ts < ?', day_params)
+        cursor.executemany('DELETE FROM alerts WHERE ts >= ? AND ts < ?', day_params)
+
+        # Insert new BP readings and evaluate the alert rules for them
+        bp_rows = [row for day_bp, _ in rows.values() for row in day_bp]
+        cursor.executemany('''
+            INSERT INTO blood_pressure_readings (ts, systolic_bp, diastolic_bp, heart_rate)
+            VALUES (?, ?, ?, ?)
+        ''', bp_rows)
+        record_alerts(cursor, bp_rows)
+        rescore_changed(cursor, previous, bp_rows)
+
+        # Re-encode the medication schedules around the saved days
+        replace_days(cursor, {date_to_day(date): day_meds for date, (_, day_meds) in rows.items()})
+
+        bump_day_versions(cursor, [date_to_day(date) for date in rows])
+        refresh_months(cursor, [day_range(date)[0] for date in rows])
+
+        deltas = []
+        for date, (day_bp, day_meds) in rows.items():
+            old_bp, old_meds = old[date]
+            new_bp, new_meds = fetch_day(cursor, date)
+            version = expected[date] + 1
+            deltas.append({
+                'date': date,
+                'source': source,
+                'version': version,
+                'bp_readings': diff_rows(old_bp, new_bp, key=lambda row: row[0]),
+                'medications': diff_rows(old_meds, new_meds, key=lambda row: (row[0], row[1])),
+                'daily_totals': load_day_totals(conn, date)
+            })
+            results[date] = {'success': True, 'version': version,
+                             'bp_readings': len(day_bp), 'medications': len(day_meds)}
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return results, deltas
+
+@app.route('/api/data/<date>', methods=['POST'])
+def save_data(date):
+    """Save/update records for a specific date"""
+    conn = metrics.connect(DB_PATH)
+    try:
+        results, deltas = write_days(conn, {date: request.json},
+                                     source=request.headers.get('X-Client-Id'))
+    finally:
+        conn.close()
+
+    publish_deltas(deltas)
+
+    result = results[date]
+    if result.get('conflict'):
+        return jsonify(result), 409
+    if not result['success']:
+        return jsonify(result), 400
+    return jsonify({'success': True, 'version': result['version']})
+
+@app.route('/api/data/batch', methods=['POST'])
+def save_batch():
+    """Save/update many dates in one transaction: {"days": {date: {bp_readings, medications, version}}}"""
+    days = (request.json or {}).get('days')
+    if not isinstance(days, dict):
+        return jsonify({'error': 'expected {"days": {date: {...}}}'}), 400
+
+    conn = metrics.connect(DB_PATH)
+    try:
+        results, deltas = write_days(conn, days, source=request.headers.get('X-Client-Id'))
+    finally:
+        conn.close()
+
+    publish_deltas(deltas)
+
+    return jsonify({
+        'success': all(result['success'] for result in results.values()),
+        'days': results
+    })
+
+def ingest_rows(conn, rows):
+    """Upsert queued device readings inside the ingest writer's transaction.
+
+    Returns the deltas to broadcast once it commits.
+    """
+    cursor = conn.cursor()
+    # The last reading for a time wins
+    rows = list({row[0]: row for row in rows}.values())
+    # Checked on submit too; this catches maintenance archiving in between
+    cutoff = archived_before(cursor)
+    if any(row[0] < cutoff for row in rows):
+        logger.warning('dropping %d ingested readings before the archive cutoff',
+                       sum(row[0] < cutoff for row in rows))
+        rows = [row for row in rows if row[0] >= cutoff]
+    dates = sorted({to_datetime_str(row[0])[:10] for row in rows})
+    old = {date: fetch_day(cursor, date) for date in dates}
+    previous = stored_readings(cursor, [(row[0], row[0] + 1) for row in rows])
+
+    cursor.executemany('''
+        INSERT OR REPLACE INTO blood_pressure_readings (ts, systolic_bp, diastolic_bp, heart_rate)
+        VALUES (?, ?, ?, ?)
+    ''', rows)
+    # Replaced readings may no longer match the rules they did before
+    cursor.executemany('DELETE FROM alerts WHERE ts = ?', [(row[0],) for row in rows])
+    record_alerts(cursor, rows)
+    rescore_changed(cursor, previous, rows)
+    bump_day_versions(cursor, [date_to_day(date) for date in dates])
+    refresh_months(cursor, [row[0] for row in rows])
+
+    deltas = []
+    for date in dates:
+        old_bp, meds = old[date]
+        new_bp, _ = fetch_day(cursor, date)
+        day = date_to_day(date)
+        deltas.append({
+            'date': date,
+            'source': 'ingest',
+            'version': load_day_versions(cursor, day, day)[day],
+            'bp_readings': diff_rows(old_bp, new_bp, key=lambda row: row[0]),
+            'medications': diff_rows(meds, meds, key=lambda row: (row[0], row[1])),
+            'daily_totals': load_day_totals(conn, date)
+        })
+    return deltas
+
+def publish_deltas(deltas):
+    """Announce committed changes: stale the hot snapshot, then tell the SSE subscribers"""
+    if deltas and hot_snapshot:
+        hot_snapshot.generation.bump()
+    for delta in deltas:
+        broadcaster.publish('delta', delta)
+
+def start_ingest(log_path=INGEST_LOG_PATH):
+    """Replay this process's ingest log and start its writer thread.
+
+    Called by whatever runs the server, not on import, so a pre-forking
+    parent has no writer thread to fork (each worker starts its own).
+    """
+    global ingest_queue
+    with ingest_lock:
+        ingest_queue = IngestQueue(DB_PATH, log_path, write=ingest_rows, on_commit=publish_deltas,
+                                   connect=metrics.connect)
+        ingest_queue.start()
+
+def running_ingest_queue():
+    """This process's ingest queue, started with the default log on first use.
+
+    Covers servers that never call start_ingest: `flask run`, a WSGI server
+    importing app, the test client.
+    """
+    with ingest_lock:
+        if ingest_queue is None:
+            start_ingest()
+        return ingest_queue
+
+def reading_rows(data):
+    """Validate an ingest payload and turn it into reading rows"""
+    readings = data.get('readings')
+    if not isinstance(readings, list) or not readings:
+        raise ValueError('expected {"readings": [{datetime, systolic, diastolic, heart_rate}, ...]}')
+    if len(readings) > MAX_INGEST_READINGS:
+        raise ValueError(f'at most {MAX_INGEST_READINGS} readings per request')
+
+    rows = []
+    for record in readings:
+        values = [record.get('systolic'), record.get('diastolic'), record.get('heart_rate')]
+        if any(value is not None and (not isinstance(value, int) or isinstance(value, bool))
+               for value in values):
+            raise ValueError(f"{record['datetime']}: values must be integers or null")
+        if not any(values):
+            raise ValueError(f"{record['datetime']}: no values")
+        rows.append((to_epoch(record['datetime']), *(value or None for value in values)))
+    return rows
+
+@app.route('/api/readings', methods=['POST'])
+def ingest_readings():
+    """Accept device readings for the background writer: {"readings": [...]}.
+
+    Answers 202 once the readings are logged and queued, 429 when the queue
+    is full, or 503 when the writer thread has stopped.
+    """
+    try:
+        rows = reading_rows(request.get_json(silent=True) or {})
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = metrics.connect(DB_PATH)
+    cutoff = archived_before(conn.cursor())
+    conn.close()
+    if any(row[0] < cutoff for row in rows):
+        return jsonify({'error': f'readings before {to_datetime_str(cutoff)[:10]} are archived'}), 400
+
+    try:
+        depth = running_ingest_queue().submit(rows)
+    except queue.Full:
+        response = jsonify({'error': 'ingest queue is full, retry later'})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    except IngestStopped:
+        logger.error('ingest writer thread is not running')
+        return jsonify({'error': 'ingest writer is not running'}), 503
+    return jsonify({'accepted': len(rows), 'queued': depth}), 202
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, stage and SQLite statement timings in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events feed of changes committed by save_data"""
+    q = broadcaster.subscribe()
+    return Response(broadcaster.stream(q), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+if __name__ == '__main__':
+    start_ingest()
+    app.run(debug=True, port=5001)
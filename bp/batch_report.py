@@ -0,0 +1,91 @@
+"""Analysis reports for many patients at once, one process per core.
+
+Each patient is a database file in one directory (patient_0001.db, ...);
+its report is written to the output directory under the same name with
+.html. Every worker builds whole reports from its own patient's database and
+column cache, so workers share nothing but the code: report.py and its
+pandas/plotly imports are loaded once in the parent before the pool forks,
+and every worker starts with them already imported.
+
+Reports are written to a temporary file and renamed, so an interrupted run
+leaves only complete reports behind. A report newer than its database is
+up to date and skipped, so rerunning the same command resumes where the
+last run stopped.
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+
+from .column_cache import CACHE_DIR
+
+
+def patient_databases(db_dir):
+    """(patient name, database path) for every *.db file in db_dir"""
+    return [(name[:-3], os.path.join(db_dir, name))
+            for name in sorted(os.listdir(db_dir)) if name.endswith('.db')]
+
+
+def is_current(output_path, db_path):
+    """A report written after the last change to its database"""
+    if not os.path.exists(output_path):
+        return False
+    changed = max(os.path.getmtime(path) for path in (db_path, db_path + '-wal')
+                  if os.path.exists(path))
+    return os.path.getmtime(output_path) >= changed
+
+
+def build_report(job):
+    """Pool task: write one patient's report; returns (patient, seconds, error)"""
+    from .report import generate_report
+
+    patient, db_path, output_path = job
+    start = time.perf_counter()
+    # One cache directory per patient next to its database; a shared one would
+    # have each patient's rebuild delete the others' columns
+    cache_dir = os.path.join(os.path.dirname(db_path), CACHE_DIR, patient)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_report(output_path + '.tmp', db_path, cache_dir)
+        os.replace(output_path + '.tmp', output_path)
+    except Exception as e:
+        return patient, time.perf_counter() - start, f'{type(e).__name__}: {e}'
+    return patient, time.perf_counter() - start, None
+
+
+def generate_reports(db_dir, output_dir, jobs=None, force=False):
+    """Write a report per patient database; returns {'built', 'skipped', 'failed'}"""
+    os.makedirs(output_dir, exist_ok=True)
+    pending = []
+    skipped = 0
+    for patient, db_path in patient_databases(db_dir):
+        output_path = os.path.join(output_dir, f'{patient}.html')
+        if not force and is_current(output_path, db_path):
+            skipped += 1
+        else:
+            pending.append((patient, db_path, output_path))
+    print(f"{len(pending)} reports to build, {skipped} already up to date")
+    if not pending:
+        return {'built': 0, 'skipped': skipped, 'failed': 0}
+
+    # Parse the report module once; forked workers inherit it
+    from . import report  # noqa: F401
+
+    jobs = min(jobs or os.cpu_count(), len(pending))
+    failed = 0
+    start = time.perf_counter()
+    context = multiprocessing.get_context('fork' if os.name == 'posix' else 'spawn')
+    with context.Pool(jobs) as pool:
+        for done, (patient, seconds, error) in enumerate(pool.imap_unordered(build_report, pending), 1):
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed
+            status = f'failed: {error}' if error else f'{seconds:.1f} s'
+            print(f"[{done}/{len(pending)}] {patient}: {status} | "
+                  f"{rate:.2f} reports/s, about {(len(pending) - done) / rate:.0f} s left", flush=True)
+            failed += error is not None
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ {len(pending) - failed} reports in {elapsed:.1f} s with {jobs} workers "
+          f"({len(pending) / elapsed:.2f} reports/s)")
+    return {'built': len(pending) - failed, 'skipped': skipped, 'failed': failed}
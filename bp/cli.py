@@ -0,0 +1,206 @@
+"""Command line entry point: `bp <command>` (or `python -m bp <command>`).
+
+Each command imports what it needs when it runs, so pandas, plotly, openpyxl
+and Flask are only loaded by the commands that use them and `bp stats` starts
+with just SQLite and the standard library (its window statistics come from the
+prefix-sum daily index, computed in SQL).
+"""
+import argparse
+import contextlib
+
+
+def profile_context(args):
+    """A Profile for --profile / --profile-output runs, else a no-op context"""
+    if not (args.profile or args.profile_output):
+        return contextlib.nullcontext()
+    from .profiling import Profile
+    return Profile(args.profile_output)
+
+
+def cmd_import(args):
+    from .importer import import_workbook
+    import_workbook(args.source)
+
+
+def cmd_report(args):
+    with profile_context(args):
+        from .report import generate_report
+        generate_report(args.output)
+
+
+def cmd_report_batch(args):
+    from .batch_report import generate_reports
+    counts = generate_reports(args.directory, args.output_dir, args.jobs, args.force)
+    if counts['failed']:
+        raise SystemExit(1)
+
+
+def cmd_view(args):
+    with profile_context(args):
+        from .windowed_view import generate_view
+        generate_view(args.output)
+
+
+def cmd_serve(args):
+    from . import metrics
+    if args.slow_query_ms is not None:
+        metrics.slow_query_seconds = args.slow_query_ms / 1000
+    if args.workers > 1:
+        if args.debug:
+            raise SystemExit('--debug runs a single process; drop --workers')
+        from .prefork import serve
+        serve(args.host, args.port, args.workers)
+        return
+
+    from .app import app, start_ingest
+    start_ingest()
+    app.run(host=args.host, port=args.port, debug=args.debug)
+
+
+def cmd_stats(args):
+    import sqlite3
+    from .daily_index import load_daily_index, window_stats
+    from .db_schema import DB_PATH, ensure_schema
+
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    index = load_daily_index(conn)
+    conn.close()
+
+    dates = index['dates']
+    if not dates:
+        print("No readings yet")
+        return
+    start = max(0, len(dates) - args.days) if args.days else 0
+    stats = window_stats(index, start, len(dates))
+
+    def fmt(value):
+        return f"{value:.1f}" if value is not None else '-'
+
+    print(f"{dates[start]} to {dates[-1]} ({len(dates) - start} days)")
+    print(f"  Readings:        {stats['readings']}")
+    print(f"  Avg systolic:    {fmt(stats['avg_systolic'])} mmHg")
+    print(f"  Avg diastolic:   {fmt(stats['avg_diastolic'])} mmHg")
+    print(f"  Avg heart rate:  {fmt(stats['avg_heart_rate'])} bpm")
+    print(f"  Alert readings:  {stats['alerts']}")
+
+
+def cmd_dose_response(args):
+    from .column_cache import load_cache
+    from .dose_response import load_fit, print_fit
+    print_fit(load_fit(load_cache()))
+
+
+def cmd_anomalies(args):
+    import sqlite3
+    from .anomaly import ANOMALY_Z, flagged_readings, rebuild_anomalies
+    from .db_schema import DB_PATH, ensure_schema
+
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    if args.rebuild:
+        rebuild_anomalies(conn)
+        conn.commit()
+        print("✓ Anomaly scores rebuilt from the full history")
+    flagged = flagged_readings(conn.cursor(), args.limit)
+    conn.close()
+
+    def fmt(z):
+        return f"{z:+6.1f}" if z is not None else '     -'
+
+    print(f"Latest readings at least {ANOMALY_Z:g} standard deviations from their baseline:")
+    for datetime_str, systolic, diastolic, heart_rate, *z_values in flagged:
+        print(f"  {datetime_str}  {systolic or '-':>3}/{diastolic or '-':<3} {heart_rate or '-':>3} bpm  "
+              f"z {' '.join(fmt(z) for z in z_values)}")
+
+
+def cmd_maintain(args):
+    from .maintenance import maintain
+    maintain(args.keep_days, args.archive_dir)
+
+
+def cmd_archive(args):
+    from .parquet_archive import export_archive, import_archive
+    if args.action == 'export':
+        counts = export_archive(args.directory, args.patient)
+        print(f"✓ Exported to {args.directory}")
+    else:
+        counts = import_archive(args.directory, args.patient)
+        print(f"✓ Imported from {args.directory}")
+    for name, count in counts.items():
+        print(f"  - {name}: {count} rows")
+
+
+def add_profile_arguments(command):
+    command.add_argument('--profile', action='store_true',
+                         help='print time and memory per stage')
+    command.add_argument('--profile-output', metavar='PREFIX',
+                         help='also write PREFIX.pstats and PREFIX.collapsed (implies --profile)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='bp', description='Blood pressure tracking')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help='import readings from the Excel workbook')
+    command.add_argument('source', nargs='?', default='source.xlsx')
+    command.set_defaults(func=cmd_import)
+
+    command = commands.add_parser('report', help='generate the static analysis report')
+    command.add_argument('-o', '--output', default='bp_analysis_report.html')
+    add_profile_arguments(command)
+    command.set_defaults(func=cmd_report)
+
+    command = commands.add_parser('report-batch', help='generate a report per patient database, in parallel')
+    command.add_argument('directory', help='directory of patient databases (*.db)')
+    command.add_argument('-o', '--output-dir', default='reports')
+    command.add_argument('-j', '--jobs', type=int, help='worker processes (default: one per core)')
+    command.add_argument('--force', action='store_true', help='rebuild reports that are up to date')
+    command.set_defaults(func=cmd_report_batch)
+
+    command = commands.add_parser('view', help='generate the self-contained windowed view')
+    command.add_argument('-o', '--output', default='bp_windowed_view.html')
+    add_profile_arguments(command)
+    command.set_defaults(func=cmd_view)
+
+    command = commands.add_parser('serve', help='run the dashboard and edit server')
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=5001)
+    command.add_argument('--debug', action='store_true')
+    command.add_argument('-w', '--workers', type=int, default=1,
+                         help='pre-fork this many worker processes sharing a hot snapshot (POSIX)')
+    command.add_argument('--slow-query-ms', type=float,
+                         help='log SQLite statements slower than this')
+    command.set_defaults(func=cmd_serve)
+
+    command = commands.add_parser('stats', help='print summary statistics')
+    command.add_argument('--days', type=int, help='only the last N days with readings')
+    command.set_defaults(func=cmd_stats)
+
+    command = commands.add_parser('dose-response', help='print per-medication effect estimates')
+    command.set_defaults(func=cmd_dose_response)
+
+    command = commands.add_parser('anomalies', help='list readings far from their baseline')
+    command.add_argument('--rebuild', action='store_true',
+                         help='recompute all scores from the full history first')
+    command.add_argument('--limit', type=int, default=20)
+    command.set_defaults(func=cmd_anomalies)
+
+    command = commands.add_parser('maintain', help='archive old readings, vacuum and optimize the database')
+    command.add_argument('--keep-days', type=int, default=365,
+                         help='keep readings of the last N days (whole months) in the database')
+    command.add_argument('--archive-dir', default='archive')
+    command.set_defaults(func=cmd_maintain)
+
+    command = commands.add_parser('archive', help='export/import Parquet archives')
+    command.add_argument('action', choices=['export', 'import'])
+    command.add_argument('directory')
+    command.add_argument('--patient', default='default')
+    command.set_defaults(func=cmd_archive)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
@@ -0,0 +1,261 @@
+"""Memory-mapped columnar cache of the database for the analytics scripts.
+
+Each column is a .npy file under .column_cache/<db version>/, where the
+version is the size and modification time of the database file (and its WAL,
+if any). The cache is rebuilt from SQLite only when that version changes;
+otherwise the columns are opened with np.load(mmap_mode='r'), so generating a
+report skips SQLite and row parsing entirely and concurrent processes share
+the same pages of the OS page cache.
+
+The cache is built from an in-memory copy of the database taken with
+SQLite's online backup API, so every column, and anything derived from the
+cache, comes from the same instant. Each build is written to a temporary
+directory and renamed into place, so processes building or mapping the cache
+at the same time (pre-forked server workers, parallel reports) never see or
+delete each other's unfinished builds. The copy takes milliseconds; the live
+database is only read (never locked against writers, in WAL mode) while it
+is made, not for the length of the build, and a report never mixes data from
+before and after a save.
+
+Run this module directly to rebuild the cache.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .alert_rules import load_rules
+from .daily_index import load_daily_index
+from .db_schema import DB_PATH, ensure_schema
+from .medication_schedule import load_doses
+from .profile_cube import load_profile
+from .profiling import checkpoint
+
+# Next to the database, like patient_bp.db itself
+CACHE_DIR = '.column_cache'
+
+READING_COLUMNS = ['systolic_bp', 'diastolic_bp', 'heart_rate']
+
+# Builds in progress are written under this prefix, then renamed to the version
+BUILD_PREFIX = '.build-'
+# Unfinished builds older than this were abandoned (the process died)
+BUILD_EXPIRY_SECONDS = 3600
+
+
+def db_version(db_path):
+    """Changes whenever SQLite writes to the database"""
+    parts = []
+    for path in (db_path, db_path + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f'{stat.st_size}-{stat.st_mtime_ns}')
+    return '_'.join(parts)
+
+
+def snapshot(conn):
+    """In-memory copy of a database as of one instant"""
+    copy = sqlite3.connect(':memory:')
+    # One step: the source's read transaction lasts only for the page copy
+    conn.backup(copy)
+    return copy
+
+
+def build_cache(conn, path):
+    """Write every column of a database snapshot to path/*.npy"""
+    os.makedirs(path, exist_ok=True)
+    cursor = conn.cursor()
+    rule_names = [rule['name'] for rule in load_rules()]
+
+    cursor.execute('''
+        SELECT ts, systolic_bp, diastolic_bp, heart_rate
+        FROM blood_pressure_readings
+        ORDER BY ts
+    ''')
+    rows = cursor.fetchall()
+    ts = np.array([row[0] for row in rows], dtype=np.int64)
+    values = np.array([row[1:4] for row in rows], dtype=float).reshape(-1, 3)
+    np.save(os.path.join(path, 'readings.ts.npy'), ts)
+    for i, column in enumerate(READING_COLUMNS):
+        np.save(os.path.join(path, f'readings.{column}.npy'), values[:, i])
+
+    # Matched alert rules as a bitmask per reading (bit i = rule_names[i])
+    alerts = np.zeros(len(ts), dtype=np.uint32)
+    cursor.execute('SELECT ts, rule FROM alerts')
+    for alert_ts, rule in cursor.fetchall():
+        if rule in rule_names:
+            alerts[np.searchsorted(ts, alert_ts)] |= 1 << rule_names.index(rule)
+    np.save(os.path.join(path, 'readings.alerts.npy'), alerts)
+
+    # Every dose, expanded from the medication schedules
+    med_rows = load_doses(cursor)
+    medication_names = sorted({row[1] for row in med_rows})
+    np.save(os.path.join(path, 'medications.ts.npy'),
+            np.array([row[0] for row in med_rows], dtype=np.int64))
+    np.save(os.path.join(path, 'medications.medication.npy'),
+            np.array([medication_names.index(row[1]) for row in med_rows], dtype=np.int16))
+    np.save(os.path.join(path, 'medications.dosage.npy'),
+            np.array([row[2] for row in med_rows], dtype=float))
+
+    daily_index = load_daily_index(conn)
+    # Time-of-day profile of all dates, from the profile cube
+    with open(os.path.join(path, 'profile.json'), 'w', encoding='utf-8') as f:
+        json.dump(load_profile(cursor), f)
+
+    index_fields = [field for field in daily_index if field != 'dates']
+    np.save(os.path.join(path, 'daily.dates.npy'),
+            np.array(daily_index['dates'], dtype='datetime64[D]'))
+    for field in index_fields:
+        np.save(os.path.join(path, f'daily.{field}.npy'),
+                np.array(daily_index[field], dtype=np.int64))
+
+    # Written last: a directory without a manifest is an unfinished build
+    with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'rules': rule_names,
+            'medication_names': medication_names,
+            'daily_index_fields': index_fields
+        }, f)
+
+
+def prune_versions(cache_dir, path):
+    """Remove the versions written before path, and builds abandoned long ago"""
+    current = os.stat(path).st_mtime_ns
+    for name in os.listdir(cache_dir):
+        other = os.path.join(cache_dir, name)
+        try:
+            written = os.stat(other).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if name.startswith(BUILD_PREFIX):
+            # Another process may still be writing it
+            if current - written < BUILD_EXPIRY_SECONDS * 10 ** 9:
+                continue
+        elif written >= current:
+            continue
+        shutil.rmtree(other, ignore_errors=True)
+
+
+def ensure_cache(db_path, cache_dir):
+    """Directory of the cache of the database's current version, built if missing.
+
+    Safe to run from several processes at once: each builds into its own
+    temporary directory and renames it into place, so no process ever sees,
+    replaces or deletes another's unfinished build.
+    """
+    path = os.path.join(cache_dir, db_version(db_path))
+    if os.path.exists(os.path.join(path, 'manifest.json')):
+        return path
+
+    conn = sqlite3.connect(db_path)
+    # Migrating an old database changes its version, so look again after
+    ensure_schema(conn)
+    path = os.path.join(cache_dir, db_version(db_path))
+    if not os.path.exists(os.path.join(path, 'manifest.json')):
+        checkpoint('rebuild column cache from SQLite')
+        os.makedirs(cache_dir, exist_ok=True)
+        build_path = tempfile.mkdtemp(prefix=BUILD_PREFIX, dir=cache_dir)
+        copy = snapshot(conn)
+        try:
+            build_cache(copy, build_path)
+            os.replace(build_path, path)
+        except OSError:
+            # Another process put the same version in place first
+            if not os.path.exists(os.path.join(path, 'manifest.json')):
+                raise
+        finally:
+            copy.close()
+            shutil.rmtree(build_path, ignore_errors=True)
+        checkpoint('map column cache')
+    conn.close()
+
+    # Processes still mapping an older version keep their pages until they
+    # exit; one that has not mapped it yet finds it gone and starts over
+    prune_versions(cache_dir, path)
+    return path
+
+
+def load_cache(db_path=DB_PATH, cache_dir=CACHE_DIR):
+    """Column arrays for readings, medications and the daily index, and the profile.
+
+    Arrays are read-only memory maps. The cache is rebuilt first if the
+    database has changed since it was written.
+    """
+    while True:
+        try:
+            return map_cache(ensure_cache(db_path, cache_dir))
+        except FileNotFoundError:
+            # Pruned by a process that built a newer version
+            continue
+
+
+def map_cache(path):
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(os.path.join(path, 'profile.json'), encoding='utf-8') as f:
+        profile = json.load(f)
+
+    def column(name):
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+    daily_index = {'dates': [str(day) for day in column('daily.dates')]}
+    for field in manifest['daily_index_fields']:
+        daily_index[field] = column(f'daily.{field}').tolist()
+
+    return {
+        'readings': {name: column(f'readings.{name}') for name in ['ts', 'alerts'] + READING_COLUMNS},
+        'medications': {name: column(f'medications.{name}') for name in ['ts', 'medication', 'dosage']},
+        'daily_index': daily_index,
+        'rules': manifest['rules'],
+        'medication_names': manifest['medication_names'],
+        'profile': profile,
+        # Directory of this data version, for results derived from it
+        'path': path
+    }
+
+
+def integer_column(values):
+    """Keep integer columns integer unless they have gaps, as read_sql_query does"""
+    return values if np.isnan(values).any() else values.astype(np.int64)
+
+
+def readings_frame(cache):
+    """Readings as a DataFrame with datetime and a list of matched rule names"""
+    readings = cache['readings']
+    df = pd.DataFrame({'ts': readings['ts']})
+    for column in READING_COLUMNS:
+        df[column] = integer_column(readings[column])
+    df['datetime'] = pd.to_datetime(df['ts'], unit='s')
+    # Names in the same (sorted) order as the API's group_concat over the alerts key
+    rule_bits = sorted((rule, bit) for bit, rule in enumerate(cache['rules']))
+    df['alerts'] = [[rule for rule, bit in rule_bits if mask >> bit & 1]
+                    for mask in readings['alerts'].tolist()]
+    return df
+
+
+def medications_frame(cache):
+    medications = cache['medications']
+    df = pd.DataFrame({
+        'ts': medications['ts'],
+        'medication_name': np.array(cache['medication_names'], dtype=object)[medications['medication']],
+        'dosage': medications['dosage']
+    })
+    df['datetime'] = pd.to_datetime(df['ts'], unit='s')
+    return df
+
+
+def count_rules(cache):
+    """Number of readings matching each rule"""
+    alerts = cache['readings']['alerts']
+    return {rule: int(np.count_nonzero(alerts & (1 << bit)))
+            for bit, rule in enumerate(cache['rules'])}
+
+
+if __name__ == '__main__':
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    cache = load_cache()
+    print(f"✓ Column cache rebuilt in {CACHE_DIR}")
+    print(f"  - {len(cache['readings']['ts'])} readings, {len(cache['medications']['ts'])} medication records")
@@ -0,0 +1,176 @@
+"""Lagged cross-correlations between heart rate, blood pressure and dosing.
+
+Readings are resampled onto a regular half-hour grid (the mean of the
+readings in each slot; most slots are empty) and every medication becomes a
+dose series (the dosage taken in each slot, 0 elsewhere). For a pair of
+series x and y the correlation at lag k is the Pearson correlation of
+x[t] and y[t + k] over the slots where both are present, so a peak at a
+positive lag means x leads y by that long.
+
+With gaps, each lag needs four sums over the overlapping slots: of x*y, x²,
+y² and the number of pairs. Each is the cross-correlation of two
+zero-filled series (the values or their presence masks), so all lags of
+all four come from a handful of real FFTs, O(n log n) in the grid length,
+rather than a loop over lags.
+
+Doses are taken at the same times every day, so the daily rhythm of BP and
+heart rate shows up in their correlation with dosing too;
+dose_response.py separates the two. Results depend only on the data, so
+they are saved in the column cache directory and reused until the
+database changes.
+
+Run this module directly to print the peak of each pair.
+"""
+import contextlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .column_cache import load_cache
+from .dose_response import TARGETS
+
+SLOT_SECONDS = 1800
+MAX_LAG_HOURS = 24
+# Lags with fewer overlapping pairs get no correlation
+MIN_PAIRS = 30
+
+RESULT_FILE = 'cross_correlation.json'
+METRIC_LABELS = {'heart_rate': 'HR', 'systolic_bp': 'SBP', 'diastolic_bp': 'DBP'}
+
+
+def grid_series(cache):
+    """Metric series (NaN where no reading) and dose series on the half-hour grid"""
+    readings = cache['readings']
+    medications = cache['medications']
+    ts = np.asarray(readings['ts'])
+    if not len(ts):
+        return {}, {}
+    first = ts[0] // SLOT_SECONDS
+    size = int(ts[-1] // SLOT_SECONDS - first) + 1
+    slots = ts // SLOT_SECONDS - first
+
+    metrics = {}
+    for metric in ('heart_rate',) + TARGETS:
+        values = np.asarray(readings[metric], dtype=float)
+        present = ~np.isnan(values)
+        counts = np.bincount(slots[present], minlength=size)
+        sums = np.bincount(slots[present], weights=values[present], minlength=size)
+        with np.errstate(invalid='ignore'):
+            metrics[metric] = sums / counts
+
+    doses = {}
+    dose_slots = np.asarray(medications['ts']) // SLOT_SECONDS - first
+    inside = (dose_slots >= 0) & (dose_slots < size)
+    codes = np.asarray(medications['medication'])
+    dosage = np.asarray(medications['dosage'])
+    for code, name in enumerate(cache['medication_names']):
+        taken = inside & (codes == code)
+        if taken.any():
+            doses[name] = np.bincount(dose_slots[taken], weights=dosage[taken], minlength=size)
+    return metrics, doses
+
+
+def lagged_sums(a, b, max_lag):
+    """sum over t of a[t] * b[t + k] for k = -max_lag..max_lag, by FFT"""
+    size = len(a) + max_lag
+    # Zero padding to at least len + max_lag keeps the circular wrap out of the lags we read
+    length = 1 << int(size - 1).bit_length()
+    spectrum = np.conj(np.fft.rfft(a, length)) * np.fft.rfft(b, length)
+    circular = np.fft.irfft(spectrum, length)
+    return np.concatenate([circular[length - max_lag:], circular[:max_lag + 1]])
+
+
+def correlate(x, y, max_lag):
+    """Correlation and number of overlapping pairs at each lag of y behind x"""
+    x_present = (~np.isnan(x)).astype(float)
+    y_present = (~np.isnan(y)).astype(float)
+    x0 = np.where(x_present > 0, x - np.nanmean(x), 0.0)
+    y0 = np.where(y_present > 0, y - np.nanmean(y), 0.0)
+
+    pairs = np.rint(lagged_sums(x_present, y_present, max_lag))
+    xy = lagged_sums(x0, y0, max_lag)
+    xx = lagged_sums(x0 * x0, y_present, max_lag)
+    yy = lagged_sums(x_present, y0 * y0, max_lag)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = xy / np.sqrt(xx * yy)
+    correlation[(pairs < MIN_PAIRS) | ~np.isfinite(correlation)] = np.nan
+    return correlation, pairs
+
+
+def pairs_to_compare(metrics, doses):
+    """(name, leading series, following series): metric pairs, then each dose against each metric"""
+    pairs = [('HR → SBP', metrics['heart_rate'], metrics['systolic_bp']),
+             ('HR → DBP', metrics['heart_rate'], metrics['diastolic_bp']),
+             ('SBP → DBP', metrics['systolic_bp'], metrics['diastolic_bp'])]
+    for name, series in doses.items():
+        for metric, label in METRIC_LABELS.items():
+            pairs.append((f'{name} → {label}', series, metrics[metric]))
+    return pairs
+
+
+def cross_correlations(cache, max_lag_hours=MAX_LAG_HOURS):
+    """Correlation by lag for every pair, with the lag of the strongest correlation"""
+    metrics, doses = grid_series(cache)
+    max_lag = int(max_lag_hours * 3600 // SLOT_SECONDS)
+    result = {'lag_hours': (np.arange(-max_lag, max_lag + 1) * SLOT_SECONDS / 3600).tolist(),
+              'pairs': {}}
+    if not metrics:
+        return result
+
+    for name, x, y in pairs_to_compare(metrics, doses):
+        correlation, pairs = correlate(x, y, max_lag)
+        peak = None
+        if not np.isnan(correlation).all():
+            best = int(np.nanargmax(np.abs(correlation)))
+            peak = {'lag_hours': result['lag_hours'][best], 'correlation': float(correlation[best])}
+        result['pairs'][name] = {
+            'correlation': [None if np.isnan(value) else round(float(value), 4) for value in correlation],
+            'pairs': pairs.astype(int).tolist(),
+            'peak': peak
+        }
+    return result
+
+
+def load_cross_correlations(cache, max_lag_hours=MAX_LAG_HOURS):
+    """cross_correlations(), reusing the result saved for this version of the data"""
+    path = os.path.join(cache['path'], RESULT_FILE)
+    params = {'max_lag_hours': max_lag_hours, 'slot_seconds': SLOT_SECONDS, 'min_pairs': MIN_PAIRS}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved['params'] == params:
+            return saved['result']
+
+    result = cross_correlations(cache, max_lag_hours)
+    # Written whole under a name of its own then renamed, so concurrent
+    # readers and writers never see half a file
+    try:
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache['path'])
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'params': params, 'result': result}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+    except FileNotFoundError:
+        # The data changed and this version's directory was pruned; the
+        # result still holds for the data it was computed from
+        pass
+    return result
+
+
+def print_peaks(result):
+    for name, pair in result['pairs'].items():
+        peak = pair['peak']
+        if peak is None:
+            print(f"  {name:<36} not enough overlapping readings")
+        else:
+            print(f"  {name:<36} r {peak['correlation']:+.2f} at {peak['lag_hours']:+g} h")
+
+
+if __name__ == '__main__':
+    print_peaks(load_cross_correlations(load_cache()))
@@ -0,0 +1,128 @@
+"""Prefix-sum index over daily blood pressure totals.
+
+Entry i of each cumulative array holds the total for all days before dates[i],
+so the totals for days [start, end) are array[end] - array[start].
+
+Days whose readings have been archived keep their totals in daily_summaries;
+a day with readings in the database is totalled from the readings.
+"""
+import json
+
+from .alert_rules import rules_in_group
+from .db_schema import SECONDS_PER_DAY, day_range, day_to_date
+
+METRIC_FIELDS = [
+    'readings',
+    'systolic_sum', 'systolic_count',
+    'diastolic_sum', 'diastolic_count',
+    'heart_rate_sum', 'heart_rate_count',
+]
+
+
+def alert_fields():
+    return [f"{rule['name']}_alerts" for rule in rules_in_group('alert')] + ['alerts']
+
+
+def daily_totals(conn, date=None):
+    """Per-day (non-cumulative) totals, for every day or a single date"""
+    # Days are ts // 86400; a single date is a primary-key range
+    where = 'WHERE ts >= ? AND ts < ?' if date else ''
+    and_where = 'AND ts >= ? AND ts < ?' if date else ''
+    params = day_range(date) if date else ()
+
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT ts / {SECONDS_PER_DAY} AS day,
+               COUNT(*),
+               COALESCE(SUM(systolic_bp), 0), COUNT(systolic_bp),
+               COALESCE(SUM(diastolic_bp), 0), COUNT(diastolic_bp),
+               COALESCE(SUM(heart_rate), 0), COUNT(heart_rate)
+        FROM blood_pressure_readings
+        {where}
+        GROUP BY day
+        ORDER BY day
+    ''', params)
+    totals = [(row[0], dict(zip(METRIC_FIELDS, row[1:]))) for row in cursor.fetchall()]
+
+    # Alert counts per day come from the alerts table rather than re-testing values:
+    # one count per 'alert' rule plus the number of readings with any alert
+    alert_rules = [rule['name'] for rule in rules_in_group('alert')]
+    placeholders = ', '.join('?' * len(alert_rules))
+    daily_alerts = {}
+    cursor.execute(f'''
+        SELECT ts / {SECONDS_PER_DAY} AS day, rule, COUNT(*)
+        FROM alerts
+        WHERE rule IN ({placeholders}) {and_where}
+        GROUP BY day, rule
+    ''', (*alert_rules, *params))
+    for day, rule, count in cursor.fetchall():
+        daily_alerts.setdefault(day, {})[f'{rule}_alerts'] = count
+    cursor.execute(f'''
+        SELECT ts / {SECONDS_PER_DAY} AS day, COUNT(DISTINCT ts)
+        FROM alerts
+        WHERE rule IN ({placeholders}) {and_where}
+        GROUP BY day
+    ''', (*alert_rules, *params))
+    for day, count in cursor.fetchall():
+        daily_alerts.setdefault(day, {})['alerts'] = count
+
+    for day, fields in totals:
+        for field in alert_fields():
+            fields[field] = daily_alerts.get(day, {}).get(field, 0)
+
+    # Archived days, with fields of rules added since they were summarized as 0
+    raw_days = {day for day, _ in totals}
+    empty = {field: 0 for field in METRIC_FIELDS + alert_fields()}
+    cursor.execute(f'''
+        SELECT day, totals FROM daily_summaries
+        {'WHERE day = ?' if date else ''}
+    ''', (params[0] // SECONDS_PER_DAY,) if date else ())
+    for day, summary in cursor.fetchall():
+        if day not in raw_days:
+            fields = json.loads(summary)
+            totals.append((day, {field: fields.get(field, 0) for field in empty}))
+    totals.sort(key=lambda item: item[0])
+    return [(day_to_date(day), fields) for day, fields in totals]
+
+
+def load_day_totals(conn, date):
+    """Totals for one date (all zero once the day has no readings)"""
+    totals = daily_totals(conn, date)
+    if totals:
+        return totals[0][1]
+    return {field: 0 for field in METRIC_FIELDS + alert_fields()}
+
+
+def load_daily_index(conn):
+    """Build the cumulative per-day arrays from the readings and alerts tables"""
+    index = {'dates': []}
+    for field in METRIC_FIELDS + alert_fields():
+        index[field] = [0]
+
+    for date, fields in daily_totals(conn):
+        index['dates'].append(date)
+        for field, value in fields.items():
+            index[field].append(index[field][-1] + value)
+
+    return index
+
+
+def window_stats(index, start, end):
+    """Readings, averages and alert counts for days [start, end) in O(1)"""
+    def total(field):
+        return index[field][end] - index[field][start]
+
+    def mean(metric):
+        count = total(f'{metric}_count')
+        return total(f'{metric}_sum') / count if count else None
+
+    stats = {
+        'readings': total('readings'),
+        'avg_systolic': mean('systolic'),
+        'avg_diastolic': mean('diastolic'),
+        'avg_heart_rate': mean('heart_rate'),
+        'alerts': total('alerts'),
+    }
+    for rule in rules_in_group('alert'):
+        stats[f"{rule['name']}_alerts"] = total(f"{rule['name']}_alerts")
+    return stats
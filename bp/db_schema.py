@@ -0,0 +1,181 @@
+"""Storage schema: readings and medications keyed by integer epoch seconds.
+
+Times are naive wall-clock timestamps stored as seconds since 1970-01-01
+00:00:00 on that same clock (SQLite's 'unixepoch' modifier, no timezone
+shift). Readings are WITHOUT ROWID and clustered on the time key, so a day
+is the primary-key range [day * 86400, (day + 1) * 86400) and grouping by day
+is integer division. The 'YYYY-MM-DD HH:MM:SS' form is only produced where
+data leaves the API, via datetime(ts, 'unixepoch') or to_datetime_str().
+
+Medications are stored as run-length encoded schedules with per-dose
+exceptions (medication_schedule.py) and expanded only for the window read.
+
+Readings older than the retention horizon are rolled up into daily_summaries
+(one row of daily totals per day) and moved to Parquet archives by
+maintenance.py; retention holds that horizon.
+
+day_versions counts the writes to each day. Anything that changes a day's rows
+bumps its version, so the edit API can reject saves based on a stale copy.
+
+Databases still using the old TEXT datetime columns are migrated on first use.
+"""
+from datetime import datetime, timedelta
+
+from .alert_rules import ensure_alerts_table
+from .anomaly import ensure_anomaly_tables
+from .medication_schedule import ensure_medication_schedules
+from .profile_cube import ensure_profile_cube
+
+DB_PATH = 'patient_bp.db'
+# Patient id of this database in Parquet archives (parquet_archive.py)
+DEFAULT_PATIENT = 'default'
+SECONDS_PER_DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value):
+    """'YYYY-MM-DD[ HH:MM[:SS]]' wall-clock time as epoch seconds"""
+    return (datetime.fromisoformat(value) - EPOCH) // timedelta(seconds=1)
+
+
+def to_datetime_str(ts):
+    return (EPOCH + timedelta(seconds=ts)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def day_to_date(day):
+    """Day number (ts // 86400) as 'YYYY-MM-DD'"""
+    return (EPOCH + timedelta(days=day)).strftime('%Y-%m-%d')
+
+
+def day_range(date):
+    """[start, end) epoch seconds covering one 'YYYY-MM-DD' date"""
+    start = to_epoch(date)
+    return start, start + SECONDS_PER_DAY
+
+
+def date_to_day(date):
+    """'YYYY-MM-DD' date as its day number"""
+    return to_epoch(date) // SECONDS_PER_DAY
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blood_pressure_readings (
+            ts INTEGER PRIMARY KEY,
+            systolic_bp INTEGER,
+            diastolic_bp INTEGER,
+            heart_rate INTEGER
+        ) WITHOUT ROWID
+    ''')
+    # Totals (as daily_index.daily_totals fields, JSON) of days whose readings are archived
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_summaries (
+            day INTEGER PRIMARY KEY,
+            totals TEXT NOT NULL
+        )
+    ''')
+    # A single row once readings have been archived: epoch seconds before
+    # which only summaries remain
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS retention (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            archived_before INTEGER NOT NULL
+        )
+    ''')
+    # Days never written have no row, i.e. version 0
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS day_versions (
+            day INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+
+def load_day_versions(cursor, first_day, last_day):
+    """{day: version} for the days first_day..last_day that have been written"""
+    cursor.execute('''
+        SELECT day, version FROM day_versions
+        WHERE day BETWEEN ? AND ?
+    ''', (first_day, last_day))
+    return dict(cursor.fetchall())
+
+
+def bump_day_versions(cursor, days):
+    """Record a write to each of the given day numbers"""
+    cursor.executemany('''
+        INSERT INTO day_versions (day, version) VALUES (?, 1)
+        ON CONFLICT (day) DO UPDATE SET version = version + 1
+    ''', [(day,) for day in days])
+
+
+def archived_before(cursor):
+    """Epoch seconds before which readings have been archived (0: none)"""
+    cursor.execute('SELECT archived_before FROM retention')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def has_text_datetimes(cursor):
+    cursor.execute('PRAGMA table_info(blood_pressure_readings)')
+    return any(column[1] == 'datetime' for column in cursor.fetchall())
+
+
+def migrate_text_datetimes(conn):
+    """Rewrite TEXT-datetime tables into the epoch-keyed layout"""
+    cursor = conn.cursor()
+    cursor.execute('ALTER TABLE blood_pressure_readings RENAME TO legacy_readings')
+    cursor.execute('ALTER TABLE medications RENAME TO legacy_medications')
+    create_tables(cursor)
+    # One row per dose, as before; ensure_medication_schedules encodes it
+    cursor.execute('''
+        CREATE TABLE medications (
+            ts INTEGER NOT NULL,
+            medication_name TEXT NOT NULL,
+            dosage REAL,
+            PRIMARY KEY (ts, medication_name)
+        ) WITHOUT ROWID
+    ''')
+
+    # strftime('%s') reads the text as UTC, i.e. keeps the wall-clock time
+    cursor.execute('''
+        INSERT OR IGNORE INTO blood_pressure_readings (ts, systolic_bp, diastolic_bp, heart_rate)
+        SELECT CAST(strftime('%s', datetime) AS INTEGER), systolic_bp, diastolic_bp, heart_rate
+        FROM legacy_readings
+        ORDER BY 1
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO medications (ts, medication_name, dosage)
+        SELECT CAST(strftime('%s', datetime) AS INTEGER), medication_name, dosage
+        FROM legacy_medications
+        ORDER BY 1, 2
+    ''')
+
+    cursor.execute('DROP TABLE legacy_readings')
+    cursor.execute('DROP TABLE legacy_medications')
+    # Keyed by the old strings; ensure_alerts_table rebuilds it from the readings
+    cursor.execute('DROP TABLE IF EXISTS alerts')
+    conn.commit()
+
+    # Give the pages of the old tables and indexes back to the file system
+    conn.execute('VACUUM')
+
+
+def ensure_schema(conn):
+    """Create (or migrate to) the epoch-keyed tables and the derived tables"""
+    cursor = conn.cursor()
+    # Lets maintenance.py give free pages back a few at a time; takes effect
+    # for new databases, and for existing ones at their next VACUUM. Setting
+    # it rewrites the header, changing the file (and column cache) version,
+    # so only when it differs
+    cursor.execute('PRAGMA auto_vacuum')
+    if cursor.fetchone()[0] != 2:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    if has_text_datetimes(cursor):
+        migrate_text_datetimes(conn)
+    else:
+        create_tables(cursor)
+        conn.commit()
+    ensure_medication_schedules(conn)
+    ensure_alerts_table(conn)
+    ensure_profile_cube(conn)
+    ensure_anomaly_tables(conn)
@@ -0,0 +1,157 @@
+"""Read-only snapshot of the hot API responses, shared by pre-forked workers.
+
+The response bodies of GET /api/data/all (every reading and dose, and the
+daily index) and of GET /api/data/<date> for the last HOT_DAYS days with
+readings are serialized once into a single file, which every worker
+memory-maps read-only. The pages are in memory once however many workers
+serve them, and no Python objects are built for them: objects built before
+forking would be unshared again page by page as reference counts change.
+
+Generation is a counter in shared memory that every committed write bumps
+(app.publish_deltas). A snapshot is named after the generation read before
+its data, and is current while the counter still has that value. The first
+request to see a newer generation starts a rebuild in the background, under
+a lock shared by all workers; requests are answered from SQLite until the
+new file exists, and then each worker maps it.
+
+Writes made outside the server (bp import, bp maintain) do not bump the
+counter; restart the server after them.
+"""
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+
+SNAPSHOT_DIR = '.hot_snapshot'
+# Days (with readings, counting back from the latest) served from the snapshot
+HOT_DAYS = 31
+# Length of the JSON index that follows it at the start of the file
+HEADER = struct.Struct('<Q')
+
+
+class Generation:
+    """A counter shared with the processes forked after it is created"""
+
+    def __init__(self):
+        self.shared = multiprocessing.Value('q', 0)
+        # Bumps made by this process (not shared)
+        self.bumps = 0
+
+    def get(self):
+        return self.shared.value
+
+    def bump(self):
+        with self.shared.get_lock():
+            self.shared.value += 1
+            self.bumps += 1
+            return self.shared.value
+
+
+def write_snapshot(path, bodies):
+    """Write {key: bytes} as header, JSON index of (offset, length) and the bodies"""
+    index = {}
+    offset = 0
+    for key, body in bodies.items():
+        index[key] = (offset, len(body))
+        offset += len(body)
+    header = json.dumps(index).encode()
+
+    # Written whole then renamed, so a worker never maps half a file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(len(header)))
+        f.write(header)
+        for body in bodies.values():
+            f.write(body)
+    os.replace(path + '.tmp', path)
+
+
+class HotSnapshot:
+    """Memory-mapped response bodies, rebuilt with build(conn) -> {key: bytes} when stale.
+
+    Create it before forking, so the generation counter and the build lock
+    are shared by the workers.
+    """
+
+    def __init__(self, db_path, build, directory=SNAPSHOT_DIR):
+        self.db_path = db_path
+        self.build = build
+        # One directory per server, removed by close()
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.generation = Generation()
+        self.build_lock = multiprocessing.Lock()
+        self.map_lock = threading.Lock()
+        # (generation, mmap, index, offset of the first body)
+        self.mapped = None
+        self.builder = None
+
+    def path(self, generation):
+        return os.path.join(self.directory, f'{generation}.bin')
+
+    def rebuild(self):
+        """Build the snapshot of the current generation, unless another process is building"""
+        if not self.build_lock.acquire(block=False):
+            return
+        try:
+            generation = self.generation.get()
+            if os.path.exists(self.path(generation)):
+                return
+            conn = sqlite3.connect(self.db_path)
+            try:
+                # One read transaction, so every body comes from the same instant
+                conn.execute('BEGIN')
+                bodies = self.build(conn)
+            finally:
+                conn.close()
+            os.makedirs(self.directory, exist_ok=True)
+            write_snapshot(self.path(generation), bodies)
+
+            # Workers still mapping older files keep their pages until they unmap
+            for name in os.listdir(self.directory):
+                if name != f'{generation}.bin':
+                    os.remove(os.path.join(self.directory, name))
+        finally:
+            self.build_lock.release()
+
+    def map(self, generation):
+        """Map the snapshot file of a generation; None if it is not built yet"""
+        with self.map_lock:
+            if self.mapped and self.mapped[0] == generation:
+                return self.mapped
+            try:
+                f = open(self.path(generation), 'rb')
+            except FileNotFoundError:
+                return None
+            with f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            size = HEADER.unpack(mm[:HEADER.size])[0]
+            index = json.loads(mm[HEADER.size:HEADER.size + size])
+            self.mapped = (generation, mm, index, HEADER.size + size)
+            return self.mapped
+
+    def body(self, key):
+        """The current body for key, or None (not in the snapshot, or being rebuilt)"""
+        generation = self.generation.get()
+        mapped = self.mapped
+        if mapped is None or mapped[0] != generation:
+            mapped = self.map(generation)
+            if mapped is None:
+                # One builder thread per process; others find the lock taken
+                with self.map_lock:
+                    if self.builder is None or not self.builder.is_alive():
+                        self.builder = threading.Thread(target=self.rebuild, name='hot-snapshot',
+                                                        daemon=True)
+                        self.builder.start()
+                return None
+
+        _, mm, index, start = mapped
+        if key not in index:
+            return None
+        offset, length = index[key]
+        return mm[start + offset:start + offset + length]
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
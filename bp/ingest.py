@@ -0,0 +1,219 @@
+"""Write-ahead queue for readings uploaded by devices.
+
+submit() appends a request's rows to a local log file and to a bounded
+in-memory queue, then returns; it never waits for SQLite. One writer thread
+drains the queue, committing everything that arrived while the previous
+commit ran as a single transaction, so the commit rate stays flat however
+fast readings arrive. When the queue is full submit() raises queue.Full and
+the API answers 429.
+
+Every log entry has a sequence number, and the writer stores the last one it
+committed in the same transaction as the rows. On start, entries the database
+has not seen (the process died before committing them) are replayed. The log
+is emptied whenever the writer has caught up. Entries are flushed to the OS,
+not fsynced, before a request is accepted: they survive the process dying,
+not the machine losing power or crashing.
+
+A batch that fails with anything but an SQLite error (which is retried) is
+committed again one entry at a time; entries that still fail are set aside
+in <log>.rejected and counted as failed, so one bad entry cannot stop the
+writer. If the writer thread has stopped anyway, submit() raises
+IngestStopped and the API answers 503.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_SIZE = 1000
+# Most queued requests committed in one transaction
+BATCH_ENTRIES = 500
+RETRY_SECONDS = 1.0
+
+ingested_readings = metrics.Counter('bp_ingested_readings_total',
+                                    'Device readings by outcome (queued, rejected, committed, failed)',
+                                    ('outcome',))
+ingest_batch_seconds = metrics.Histogram('bp_ingest_batch_seconds',
+                                         'Time to commit one batch of queued readings')
+
+
+class IngestStopped(Exception):
+    """The writer thread is not running, so submitted readings would never be committed"""
+
+
+def ensure_ingest_table(conn, log_path):
+    # One row per log file (a pre-forked server has one per worker): the
+    # sequence number of its last committed entry
+    last_seq = 0
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(ingest_state)')]
+    if 'id' in columns:
+        # The single-log layout; its row belongs to the first log opened
+        last_seq = conn.execute('SELECT last_seq FROM ingest_state').fetchone()[0]
+        conn.execute('DROP TABLE ingest_state')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_state (
+            log TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('INSERT OR IGNORE INTO ingest_state (log, last_seq) VALUES (?, ?)', (log_path, last_seq))
+    conn.commit()
+
+
+def read_log(path):
+    """(seq, rows) entries of a log file; a torn last line is skipped"""
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning('skipping incomplete ingest log entry')
+                continue
+            entries.append((entry['seq'], [tuple(row) for row in entry['rows']]))
+    return entries
+
+
+class IngestQueue:
+    """Bounded, logged queue of reading rows drained by a writer thread.
+
+    write(conn, rows) stores rows inside the writer's transaction and returns
+    whatever on_commit(result) should get once that transaction commits.
+    """
+
+    def __init__(self, db_path, log_path, write, on_commit=None, maxsize=INGEST_QUEUE_SIZE,
+                 batch_entries=BATCH_ENTRIES, connect=sqlite3.connect):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.write = write
+        self.on_commit = on_commit
+        self.batch_entries = batch_entries
+        self.connect = connect
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.log = None
+        self.thread = None
+
+    def replay(self):
+        """Commit the entries left in the log; returns the last committed sequence number"""
+        conn = self.connect(self.db_path)
+        ensure_ingest_table(conn, self.log_path)
+        last_seq = conn.execute('SELECT last_seq FROM ingest_state WHERE log = ?',
+                                (self.log_path,)).fetchone()[0]
+        pending = [entry for entry in read_log(self.log_path) if entry[0] > last_seq]
+        for start in range(0, len(pending), self.batch_entries):
+            self.commit_batch(conn, pending[start:start + self.batch_entries])
+        if pending:
+            logger.info('replayed %d ingest log entries', len(pending))
+            last_seq = pending[-1][0]
+        conn.close()
+        return last_seq
+
+    def start(self):
+        """Replay entries left in the log, then start the writer thread"""
+        self.next_seq = self.replay() + 1
+        self.log = open(self.log_path, 'w', encoding='utf-8')
+        self.thread = threading.Thread(target=self.run, name='ingest-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, rows):
+        """Log and enqueue rows; returns the queue depth. Raises queue.Full or IngestStopped"""
+        if self.thread is None or not self.thread.is_alive():
+            raise IngestStopped
+        with self.lock:
+            if self.queue.full():
+                ingested_readings.inc(('rejected',), len(rows))
+                raise queue.Full
+            seq = self.next_seq
+            self.next_seq += 1
+            # Flushed to the OS before accepting, so it survives the process
+            # dying (not a power loss: there is no fsync)
+            self.log.write(json.dumps({'seq': seq, 'rows': rows}, separators=(',', ':')) + '\n')
+            self.log.flush()
+            self.queue.put_nowait((seq, rows))
+        ingested_readings.inc(('queued',), len(rows))
+        return self.queue.qsize()
+
+    def commit(self, conn, entries):
+        start = time.perf_counter()
+        rows = [row for _, entry_rows in entries for row in entry_rows]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = self.write(conn, rows)
+            conn.execute('UPDATE ingest_state SET last_seq = ? WHERE log = ?',
+                         (entries[-1][0], self.log_path))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        ingest_batch_seconds.observe((), time.perf_counter() - start)
+        ingested_readings.inc(('committed',), len(rows))
+        if self.on_commit:
+            # Committed already, so a failing listener must not retry the batch
+            try:
+                self.on_commit(result)
+            except Exception:
+                logger.exception('ingest commit listener failed')
+
+    def commit_batch(self, conn, entries):
+        """Commit entries, retrying SQLite errors and setting aside entries that cannot be written"""
+        while True:
+            # Rows were validated on submit, so SQLite errors are transient (a
+            # lock held past the busy timeout); keep the batch until it commits
+            try:
+                self.commit(conn, entries)
+                return
+            except sqlite3.Error:
+                logger.exception('ingest commit failed, retrying')
+                time.sleep(RETRY_SECONDS)
+            except Exception:
+                if len(entries) == 1:
+                    logger.exception('setting aside ingest log entry %d', entries[0][0])
+                    self.set_aside(conn, entries[0])
+                    return
+                logger.exception('ingest batch failed, committing its entries one at a time')
+                for entry in entries:
+                    self.commit_batch(conn, [entry])
+                return
+
+    def set_aside(self, conn, entry):
+        """Move an entry that cannot be written to <log>.rejected, and past it in the log"""
+        seq, rows = entry
+        with open(self.log_path + '.rejected', 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'seq': seq, 'rows': rows}, separators=(',', ':')) + '\n')
+        conn.execute('UPDATE ingest_state SET last_seq = ? WHERE log = ?', (seq, self.log_path))
+        conn.commit()
+        ingested_readings.inc(('failed',), len(rows))
+
+    def run(self):
+        conn = self.connect(self.db_path)
+        while True:
+            entries = [self.queue.get()]
+            while len(entries) < self.batch_entries:
+                try:
+                    entries.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.commit_batch(conn, entries)
+
+            with self.lock:
+                # Caught up: everything logged is committed
+                if self.queue.empty():
+                    self.log.seek(0)
+                    self.log.truncate()
+            for _ in entries:
+                self.queue.task_done()
+
+    def drain(self):
+        """Block until everything submitted so far is committed"""
+        self.queue.join()
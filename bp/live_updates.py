@@ -0,0 +1,76 @@
+"""In-process fan-out of data changes to Server-Sent Events subscribers.
+
+Each subscriber gets its own bounded queue. A subscriber that falls too far
+behind has its backlog replaced by a single 'resync' event, telling the client
+to refetch instead of holding up the writers or growing memory without bound.
+"""
+import json
+import queue
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+
+
+class Broadcaster:
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Drop the backlog; the client reloads everything on 'resync'
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(format_event('resync', {}))
+
+    def stream(self, q):
+        """Yield SSE messages for one subscriber until the client disconnects"""
+        try:
+            yield format_event('hello', {})
+            while True:
+                try:
+                    yield q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(q)
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def diff_rows(old_rows, new_rows, key):
+    """Split a day's rewrite into added, updated and deleted rows"""
+    old = {key(row): row for row in old_rows}
+    new = {key(row): row for row in new_rows}
+    return {
+        'added': [row for k, row in new.items() if k not in old],
+        'updated': [row for k, row in new.items() if k in old and old[k] != row],
+        'deleted': [list(k) if isinstance(k, tuple) else k for k in old if k not in new],
+    }
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,136 @@
+"""Database maintenance: retention, rollup and archiving, vacuum and statistics.
+
+`bp maintain` keeps the database small enough to stay in the page cache:
+
+1. Readings from months that ended more than --keep-days ago are rolled up
+   into daily_summaries (the daily index totals of each day), written to
+   zstd-compressed Parquet files in the archive directory (the layout of
+   parquet_archive.py), and deleted with their alerts and anomaly scores.
+   Their values stay in the anomaly state, so the baselines keep their
+   history (and restoring them does not fold them in again). Whole months
+   are archived, so the profile cube keeps exact cells for them;
+   medications are small and stay. retention.archived_before records how
+   far archiving has gone.
+2. Free pages (left by archiving and by saves deleting and re-inserting
+   days) are returned to the file system by incremental vacuum passes,
+   each its own short transaction so saves can interleave. A database
+   created before auto_vacuum was INCREMENTAL gets one full VACUUM first.
+3. Query planner statistics are refreshed: ANALYZE after archiving, which
+   changes the tables a lot, and PRAGMA optimize always.
+
+`bp archive import` puts archived readings back; days with readings are then
+totalled from the readings again rather than from their summaries.
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from .daily_index import daily_totals
+from .db_schema import DB_PATH, DEFAULT_PATIENT, SECONDS_PER_DAY, archived_before, ensure_schema, to_epoch
+
+KEEP_DAYS = 365
+ARCHIVE_DIR = 'archive'
+# Pages freed per incremental vacuum pass (4 MB of 4 KB pages)
+VACUUM_PAGES = 1024
+
+
+def retention_cutoff(keep_days, today=None):
+    """Start of the month containing the day keep_days before today, as epoch seconds"""
+    day = (today or date.today()) - timedelta(days=keep_days)
+    return to_epoch(day.replace(day=1).isoformat())
+
+
+def archive_readings(conn, cutoff, archive_dir, patient=DEFAULT_PATIENT):
+    """Roll up, archive and delete the readings before cutoff; returns the row count
+
+    Raises ImportError if there are readings to archive but pyarrow (the
+    parquet extra) is not installed.
+    """
+    cursor = conn.cursor()
+    # Hold the write lock throughout, so no reading is saved into the
+    # archived range between exporting it and deleting it
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        count = 0
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM blood_pressure_readings WHERE ts < ?)', (cutoff,))
+        if cursor.fetchone()[0]:
+            # pyarrow is only needed once there is something to archive
+            from .parquet_archive import export_table
+            count = export_table(conn, 'readings', archive_dir, patient, before=cutoff,
+                                 part=f'part-{int(time.time())}')
+        if count:
+            cutoff_date = time.strftime('%Y-%m-%d', time.gmtime(cutoff))
+            cursor.executemany('''
+                INSERT OR REPLACE INTO daily_summaries (day, totals) VALUES (?, ?)
+            ''', [(to_epoch(day) // SECONDS_PER_DAY, json.dumps(fields))
+                  for day, fields in daily_totals(conn) if day < cutoff_date])
+            for table in ('alerts', 'anomaly_scores', 'blood_pressure_readings'):
+                cursor.execute(f'DELETE FROM {table} WHERE ts < ?', (cutoff,))
+        cursor.execute('''
+            INSERT INTO retention (id, archived_before) VALUES (0, ?)
+            ON CONFLICT (id) DO UPDATE SET archived_before = MAX(archived_before, excluded.archived_before)
+        ''', (cutoff,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return count
+
+
+def pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def vacuum(conn, pages=VACUUM_PAGES):
+    """Give free pages back to the file system; returns the number of passes"""
+    if pragma(conn, 'auto_vacuum') != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return 1
+
+    passes = 0
+    while pragma(conn, 'freelist_count'):
+        # execute() would step the pragma once, freeing a single page;
+        # executescript() runs it to completion in its own transaction
+        conn.executescript(f'PRAGMA incremental_vacuum({pages});')
+        passes += 1
+    return passes
+
+
+def file_size(db_path):
+    return sum(os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path))
+
+
+def maintain(keep_days=KEEP_DAYS, archive_dir=ARCHIVE_DIR, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    size = file_size(db_path)
+
+    cutoff = retention_cutoff(keep_days)
+    archived = 0
+    if cutoff > archived_before(conn.cursor()):
+        try:
+            archived = archive_readings(conn, cutoff, archive_dir)
+            print(f"✓ Archived {archived} readings before {time.strftime('%Y-%m-%d', time.gmtime(cutoff))}"
+                  f" to {archive_dir}")
+        except ImportError:
+            print("⚠ Not archiving: writing Parquet needs pyarrow (pip install 'bp[parquet]')")
+    else:
+        print("✓ No readings old enough to archive")
+
+    print(f"✓ Vacuumed in {vacuum(conn)} passes")
+    if archived:
+        conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+    # Fold the WAL back into the database file
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+    mb = 2 ** 20
+    print(f"✓ Database: {size / mb:.1f} MB -> {file_size(db_path) / mb:.1f} MB")
+
+
+if __name__ == '__main__':
+    maintain()
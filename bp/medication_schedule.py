@@ -0,0 +1,220 @@
+"""Medications stored as run-length encoded schedules instead of one row per dose.
+
+A chronic regimen is the same dose at the same time every day for months, so
+doses are stored as
+
+    medication_schedules   (medication, time of day, dosage, valid from/to day)
+                           = one dose on every day of the range
+    medication_exceptions  (ts, medication, dosage) = a dose outside any
+                           schedule, or with dosage NULL, a scheduled dose
+                           that was not taken
+
+with the names in medication_names. load_doses() expands the schedules and
+applies the exceptions for just the window asked for.
+
+Writers never edit schedules directly: set_doses() says which doses some days
+should have, and the doses around those days are decoded and encoded again;
+schedules reaching further are cut there, and the cut-off parts rejoin
+whatever is encoded next to them, so a save costs the same however long the
+regimen. Encoding groups doses by medication and time of day and finds runs
+of days with the same dosage; runs of at least MIN_RUN_DAYS become a schedule,
+bridging gaps of up to MAX_GAP_DAYS with skip exceptions, and anything
+shorter is stored as exceptions. Re-encoding also takes in MIN_RUN_DAYS on
+each side, so doses entered a day at a time join (or become) a schedule.
+"""
+SECONDS_PER_DAY = 86400
+MIN_RUN_DAYS = 7
+MAX_GAP_DAYS = 2
+
+
+def create_schedule_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medication_names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medication_schedules (
+            id INTEGER PRIMARY KEY,
+            medication_id INTEGER NOT NULL REFERENCES medication_names (id),
+            time_of_day INTEGER NOT NULL,
+            dosage REAL NOT NULL,
+            valid_from INTEGER NOT NULL,
+            valid_to INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedules_valid ON medication_schedules (valid_from, valid_to)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medication_exceptions (
+            ts INTEGER NOT NULL,
+            medication_id INTEGER NOT NULL REFERENCES medication_names (id),
+            dosage REAL,
+            PRIMARY KEY (ts, medication_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def ensure_medication_schedules(conn):
+    """Create the schedule tables, converting a one-row-per-dose medications table"""
+    cursor = conn.cursor()
+    create_schedule_tables(cursor)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medications'")
+    if cursor.fetchone():
+        cursor.execute('SELECT ts, medication_name, dosage FROM medications')
+        merge_doses(cursor, cursor.fetchall())
+        cursor.execute('DROP TABLE medications')
+    conn.commit()
+
+
+def load_doses(cursor, start=None, end=None):
+    """(ts, medication name, dosage) of every dose in [start, end), in time order"""
+    start = 0 if start is None else start
+    end = 2 ** 62 if end is None else end
+    first_day, last_day = start // SECONDS_PER_DAY, (end - 1) // SECONDS_PER_DAY
+
+    doses = {}
+    cursor.execute('''
+        SELECT n.name, s.time_of_day, s.dosage, s.valid_from, s.valid_to
+        FROM medication_schedules s JOIN medication_names n ON n.id = s.medication_id
+        WHERE s.valid_from <= ? AND s.valid_to >= ?
+    ''', (last_day, first_day))
+    for name, time_of_day, dosage, valid_from, valid_to in cursor.fetchall():
+        for day in range(max(valid_from, first_day), min(valid_to, last_day) + 1):
+            ts = day * SECONDS_PER_DAY + time_of_day
+            if start <= ts < end:
+                doses[ts, name] = dosage
+
+    cursor.execute('''
+        SELECT e.ts, n.name, e.dosage
+        FROM medication_exceptions e JOIN medication_names n ON n.id = e.medication_id
+        WHERE e.ts >= ? AND e.ts < ?
+    ''', (start, end))
+    for ts, name, dosage in cursor.fetchall():
+        if dosage is None:
+            doses.pop((ts, name), None)
+        else:
+            doses[ts, name] = dosage
+    return [(ts, name, dosage) for (ts, name), dosage in sorted(doses.items())]
+
+
+def encode(doses, spans=()):
+    """Schedules (name, time of day, dosage, from, to) and exceptions (ts, name, dosage) for doses.
+
+    spans are (name, time of day, dosage, from, to) pieces of stored schedules
+    next to the doses; runs of doses can join them, and they come back as
+    (part of) a schedule. Their own exceptions are left where they are.
+    """
+    runs = {}
+    for ts, name, dosage in doses:
+        day = ts // SECONDS_PER_DAY
+        runs.setdefault((name, ts % SECONDS_PER_DAY), []).append((day, day, dosage))
+    for name, time_of_day, dosage, first, last in spans:
+        runs.setdefault((name, time_of_day), []).append((first, last, dosage))
+
+    schedules, exceptions = [], []
+    for (name, time_of_day), days in runs.items():
+        days.sort()
+        start = 0
+        for i in range(1, len(days) + 1):
+            # A run continues while the dosage is the same and gaps are short
+            if (i < len(days) and days[i][2] == days[start][2]
+                    and days[i][0] - days[i - 1][1] <= MAX_GAP_DAYS + 1):
+                continue
+            run = days[start:i]
+            first, last, dosage = run[0][0], run[-1][1], run[0][2]
+            if last - first + 1 >= MIN_RUN_DAYS:
+                schedules.append((name, time_of_day, dosage, first, last))
+                exceptions.extend((day * SECONDS_PER_DAY + time_of_day, name, None)
+                                  for before, after in zip(run, run[1:])
+                                  for day in range(before[1] + 1, after[0]))
+            else:
+                exceptions.extend((day * SECONDS_PER_DAY + time_of_day, name, dosage)
+                                  for first, last, dosage in run for day in range(first, last + 1))
+            start = i
+    return schedules, exceptions
+
+
+def medication_ids(cursor, names):
+    cursor.executemany('INSERT OR IGNORE INTO medication_names (name) VALUES (?)',
+                       [(name,) for name in names])
+    cursor.execute('SELECT name, id FROM medication_names')
+    return dict(cursor.fetchall())
+
+
+def set_doses(cursor, first_day, last_day, doses):
+    """Make `doses` the doses of days first_day..last_day, re-encoding the schedules around them"""
+    # Only the days plus MIN_RUN_DAYS either side are decoded and encoded
+    # again; schedules reaching past that window are cut at its ends and the
+    # parts outside are passed to encode() as they are. A part shorter than a
+    # run is taken into the window instead.
+    low, high = first_day - MIN_RUN_DAYS, last_day + MIN_RUN_DAYS
+    while True:
+        cursor.execute('''
+            SELECT s.id, n.name, s.time_of_day, s.dosage, s.valid_from, s.valid_to
+            FROM medication_schedules s JOIN medication_names n ON n.id = s.medication_id
+            WHERE s.valid_from <= ? AND s.valid_to >= ?
+        ''', (high, low))
+        overlapping = cursor.fetchall()
+        reach_low = min([low] + [row[4] for row in overlapping if low - MIN_RUN_DAYS < row[4] < low])
+        reach_high = max([high] + [row[5] for row in overlapping if high < row[5] < high + MIN_RUN_DAYS])
+        if (reach_low, reach_high) == (low, high):
+            break
+        low, high = reach_low, reach_high
+
+    spans = []
+    for _, name, time_of_day, dosage, valid_from, valid_to in overlapping:
+        if valid_from < low:
+            spans.append((name, time_of_day, dosage, valid_from, low - 1))
+        if valid_to > high:
+            spans.append((name, time_of_day, dosage, high + 1, valid_to))
+
+    start, end = low * SECONDS_PER_DAY, (high + 1) * SECONDS_PER_DAY
+    kept = [dose for dose in load_doses(cursor, start, end)
+            if not first_day <= dose[0] // SECONDS_PER_DAY <= last_day]
+    schedules, exceptions = encode(kept + list(doses), spans)
+
+    cursor.executemany('DELETE FROM medication_schedules WHERE id = ?', [(row[0],) for row in overlapping])
+    cursor.execute('DELETE FROM medication_exceptions WHERE ts >= ? AND ts < ?', (start, end))
+    ids = medication_ids(cursor, {row[0] for row in schedules} | {row[1] for row in exceptions})
+    cursor.executemany('''
+        INSERT INTO medication_schedules (medication_id, time_of_day, dosage, valid_from, valid_to)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(ids[name], *rest) for name, *rest in schedules])
+    cursor.executemany('''
+        INSERT INTO medication_exceptions (ts, medication_id, dosage) VALUES (?, ?, ?)
+    ''', [(ts, ids[name], dosage) for ts, name, dosage in exceptions])
+
+
+def replace_days(cursor, days):
+    """Make each {day number: doses} the doses of that day, one re-encode per run of consecutive days"""
+    run = []
+    for day in sorted(days) + [None]:
+        if run and (day is None or day != run[-1] + 1):
+            set_doses(cursor, run[0], run[-1], [dose for d in run for dose in days[d]])
+            run = []
+        run.append(day)
+
+
+def merge_doses(cursor, doses, replace=True):
+    """Add (ts, name, dosage) doses, like INSERT OR REPLACE (or OR IGNORE with replace=False).
+
+    Returns the doses that were added or changed.
+    """
+    doses = list(doses)
+    if not doses:
+        return []
+    first_day = min(dose[0] for dose in doses) // SECONDS_PER_DAY
+    last_day = max(dose[0] for dose in doses) // SECONDS_PER_DAY
+    current = {(ts, name): dosage for ts, name, dosage in
+               load_doses(cursor, first_day * SECONDS_PER_DAY, (last_day + 1) * SECONDS_PER_DAY)}
+
+    changed = []
+    for ts, name, dosage in doses:
+        if (ts, name) not in current or (replace and current[ts, name] != dosage):
+            current[ts, name] = dosage
+            changed.append((ts, name, dosage))
+    if changed:
+        set_doses(cursor, first_day, last_day,
+                  [(ts, name, dosage) for (ts, name), dosage in current.items()])
+    return changed
@@ -0,0 +1,289 @@
+"""Request and SQLite timing for the API, exposed in Prometheus text format.
+
+Each request records how long it spent in the connect, query and serialize
+stages and in total, plus rows fetched and bytes sent, labelled by route.
+Connections from connect() time every cursor execute/fetch as query time and
+per statement: a statement's time is what its execute and fetch calls spent
+inside sqlite3, so the Python work between them is left out. Statements slower
+than slow_query_seconds are logged.
+
+Statements are timed by a cursor subclass rather than SQLite's trace
+callback: the callback only marks where each statement starts, so timing
+from one call to the next charged the Python work between statements (and
+between fetches) to the previous statement.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Log statements slower than this many seconds (None disables the log)
+slow_query_seconds = None
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(self.labels, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, labels, value):
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            else:
+                entry[0][-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for labels, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    bucket_labels = format_labels(self.labels + ('le',), labels + (bound,))
+                    lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {total}')
+                lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {count}')
+        return lines
+
+
+request_seconds = Histogram('bp_request_seconds', 'Time per route and stage (connect, query, serialize, total)',
+                            ('route', 'stage'))
+requests_total = Counter('bp_requests_total', 'Requests per route and status', ('route', 'status'))
+rows_returned = Counter('bp_rows_returned_total', 'Rows fetched from SQLite per route', ('route',))
+bytes_out = Counter('bp_response_bytes_total', 'Response body bytes per route', ('route',))
+statement_seconds = Histogram('bp_sqlite_statement_seconds', 'SQLite statement time by operation and table',
+                              ('statement',))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Per-request state; requests are handled one per thread
+current = threading.local()
+
+
+def begin_request(route):
+    current.route = route
+    current.start = time.perf_counter()
+    current.stages = {}
+    current.rows = 0
+
+
+def add_stage(name, seconds):
+    stages = getattr(current, 'stages', None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+def add_rows(count):
+    if getattr(current, 'stages', None) is not None:
+        current.rows += count
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(name, time.perf_counter() - start)
+
+
+def end_request(status, content_length):
+    stages = getattr(current, 'stages', None)
+    if stages is None:
+        return
+    route = current.route
+    stages['total'] = time.perf_counter() - current.start
+    for name, seconds in stages.items():
+        request_seconds.observe((route, name), seconds)
+    requests_total.inc((route, str(status)))
+    if current.rows:
+        rows_returned.inc((route,), current.rows)
+    # Streamed responses have no length up front
+    if content_length is not None:
+        bytes_out.inc((route,), content_length)
+    current.stages = None
+
+
+STATEMENT_PATTERN = re.compile(r'^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+))?',
+                               re.IGNORECASE | re.DOTALL)
+PARENTHESES_PATTERN = re.compile(r'\([^()]*\)')
+
+
+def statement_label(sql):
+    """Low-cardinality label for a statement: operation and first table"""
+    # Drop parenthesised parts (subqueries, function calls) so their tables don't count
+    previous = None
+    while previous != sql:
+        previous, sql = sql, PARENTHESES_PATTERN.sub('', sql)
+    match = STATEMENT_PATTERN.match(sql)
+    if not match:
+        return 'other'
+    operation, table = match.groups()
+    return f'{operation.upper()} {table}' if table else operation.upper()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor timing each statement across its execute and fetch calls.
+
+    Only time spent inside sqlite3 counts, so Python work between fetches
+    (building rows, encoding JSON) is not charged to the statement. A statement
+    is recorded once its rows are exhausted, or when the cursor runs the next
+    one or is closed.
+    """
+    sql = None
+    seconds = 0.0
+
+    def timed(self, call, *args):
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            add_stage('query', seconds)
+            self.seconds += seconds
+
+    def start_statement(self, call, sql, *args):
+        self.finish_statement()
+        self.sql = sql
+        self.seconds = 0.0
+        result = self.timed(call, sql, *args)
+        # Nothing to fetch (DML, DDL, transaction control): done already
+        if self.description is None:
+            self.finish_statement()
+        return result
+
+    def finish_statement(self):
+        if self.sql is None:
+            return
+        sql, seconds = self.sql, self.seconds
+        self.sql = None
+        statement_seconds.observe((statement_label(sql),), seconds)
+        if slow_query_seconds is not None and seconds >= slow_query_seconds:
+            logger.warning('slow query (%.1f ms): %s', seconds * 1000, ' '.join(sql.split())[:500])
+
+    def execute(self, sql, *args):
+        return self.start_statement(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.start_statement(super().executemany, sql, *args)
+
+    def fetchone(self):
+        row = self.timed(super().fetchone)
+        add_rows(row is not None)
+        if row is None:
+            self.finish_statement()
+        return row
+
+    def __next__(self):
+        try:
+            row = self.timed(super().__next__)
+        except StopIteration:
+            self.finish_statement()
+            raise
+        add_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self.timed(super().fetchmany, *args)
+        add_rows(len(rows))
+        if not rows:
+            self.finish_statement()
+        return rows
+
+    def fetchall(self):
+        rows = self.timed(super().fetchall)
+        add_rows(len(rows))
+        self.finish_statement()
+        return rows
+
+    def close(self):
+        self.finish_statement()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Cursors whose last statement may still be unrecorded at close()
+        self.cursors = weakref.WeakSet()
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        if isinstance(cursor, InstrumentedCursor):
+            self.cursors.add(cursor)
+        return cursor
+
+    # sqlite3's shortcuts don't go through cursor(), so route them there
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def close(self):
+        for cursor in list(self.cursors):
+            cursor.finish_statement()
+        super().close()
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect with query timing, timed as the request's connect stage"""
+    with stage('connect'):
+        return sqlite3.connect(database, factory=InstrumentedConnection, **kwargs)
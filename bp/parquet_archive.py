@@ -0,0 +1,221 @@
+"""Parquet export/import of readings and medications for backups and transfer.
+
+Layout (hive partitioning, one file per patient and month):
+
+    <dir>/readings/patient=<id>/month=YYYY-MM/part-0.parquet
+    <dir>/medications/patient=<id>/month=YYYY-MM/part-0.parquet
+
+(maintenance.py archives old readings in the same layout, one part file per
+run, so `bp archive import` restores them).
+
+Times are timestamp columns holding the epoch keys (Parquet keeps them at
+millisecond precision) and medication names are dictionary-encoded.
+Medications are written one row per dose, expanded from the schedules. Both
+directions stream in batches: export walks each table in key order and
+starts a new file whenever the month changes; import reads the dataset
+batch by batch into executemany upserts inside one transaction.
+
+    bp archive export <dir> [--patient ID]
+    bp archive import <dir> [--patient ID]
+"""
+import argparse
+import os
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .alert_rules import record_alerts
+from .anomaly import rescore_changed, score_readings, stored_readings
+from .medication_schedule import load_doses, merge_doses
+from .profile_cube import refresh_months
+from .db_schema import (DB_PATH, DEFAULT_PATIENT, SECONDS_PER_DAY, archived_before, bump_day_versions,
+                        ensure_schema, to_datetime_str)
+
+BATCH_ROWS = 10000
+# Beyond any epoch key, for exporting whole tables
+NO_LIMIT = 2 ** 62
+
+READINGS_SCHEMA = pa.schema([
+    ('ts', pa.timestamp('s')),
+    ('systolic_bp', pa.int32()),
+    ('diastolic_bp', pa.int32()),
+    ('heart_rate', pa.int32()),
+])
+
+MEDICATIONS_SCHEMA = pa.schema([
+    ('ts', pa.timestamp('s')),
+    ('medication_name', pa.dictionary(pa.int16(), pa.string())),
+    ('dosage', pa.float64()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('patient', pa.string()), ('month', pa.string())]),
+                               flavor='hive')
+
+TABLES = {
+    'readings': {
+        'schema': READINGS_SCHEMA,
+        'select': '''
+            SELECT strftime('%Y-%m', ts, 'unixepoch'), ts, systolic_bp, diastolic_bp, heart_rate
+            FROM blood_pressure_readings
+            WHERE ts < ?
+            ORDER BY ts
+        ''',
+        'insert': '''
+            INSERT OR REPLACE INTO blood_pressure_readings (ts, systolic_bp, diastolic_bp, heart_rate)
+            VALUES (?, ?, ?, ?)
+        ''',
+    },
+    # One row per dose, expanded from the schedules on export and encoded
+    # again on import (medication_schedule.py)
+    'medications': {
+        'schema': MEDICATIONS_SCHEMA,
+    },
+}
+
+
+def table_batches(cursor, name, before):
+    """Batches of (month, *row) rows of one table in key order"""
+    if name == 'medications':
+        doses = [(to_datetime_str(ts)[:7], ts, medication, dosage)
+                 for ts, medication, dosage in load_doses(cursor, None, before)]
+        for i in range(0, len(doses), BATCH_ROWS):
+            yield doses[i:i + BATCH_ROWS]
+        return
+
+    cursor.execute(TABLES[name]['select'], (before,))
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        yield rows
+
+
+def to_record_batch(rows, schema):
+    """SQLite rows (without the month column) as an Arrow record batch"""
+    columns = list(zip(*rows))
+    arrays = [pa.array(columns[0], pa.int64()).cast(pa.timestamp('s'))]
+    for values, field in zip(columns[1:], list(schema)[1:]):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode().cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def export_table(conn, name, out_dir, patient, before=None, part='part-0'):
+    """Stream one table (rows before `before`, if given) into per-month Parquet files.
+
+    Returns the row count.
+    """
+    table = TABLES[name]
+    cursor = conn.cursor()
+
+    writer = None
+    month = None
+    count = 0
+    try:
+        for rows in table_batches(cursor, name, NO_LIMIT if before is None else before):
+            # Rows arrive in key order, so each month is one contiguous run
+            start = 0
+            for i in range(1, len(rows) + 1):
+                if i < len(rows) and rows[i][0] == rows[start][0]:
+                    continue
+                if rows[start][0] != month:
+                    if writer:
+                        writer.close()
+                    month = rows[start][0]
+                    path = os.path.join(out_dir, name, f'patient={patient}', f'month={month}')
+                    os.makedirs(path, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(path, f'{part}.parquet'),
+                                              table['schema'], compression='zstd')
+                writer.write_batch(to_record_batch([row[1:] for row in rows[start:i]],
+                                                   table['schema']))
+                count += i - start
+                start = i
+    finally:
+        if writer:
+            writer.close()
+    return count
+
+
+def import_table(conn, name, in_dir, patient):
+    """Stream one table's partitions for a patient into SQLite; returns the row count"""
+    table = TABLES[name]
+    # Maintenance archives hold readings only
+    if not os.path.isdir(os.path.join(in_dir, name)):
+        return 0
+    dataset = ds.dataset(os.path.join(in_dir, name), format='parquet', partitioning=PARTITIONING)
+    cursor = conn.cursor()
+    cutoff = archived_before(cursor)
+
+    count = 0
+    doses = []
+    for batch in dataset.to_batches(columns=table['schema'].names,
+                                    filter=ds.field('patient') == patient,
+                                    batch_size=BATCH_ROWS):
+        # Parquet stores seconds as timestamp[ms]; back to epoch seconds
+        columns = [batch.column('ts').cast(pa.timestamp('s')).cast(pa.int64()).to_pylist()]
+        for field in table['schema'].names[1:]:
+            column = batch.column(field)
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(pa.string())
+            columns.append(column.to_pylist())
+        rows = list(zip(*columns))
+
+        if name == 'medications':
+            doses.extend(rows)
+        else:
+            previous = stored_readings(cursor, [(row[0], row[0] + 1) for row in rows])
+            cursor.executemany(table['insert'], rows)
+            # Replaced readings may no longer match the rules they did before
+            cursor.executemany('DELETE FROM alerts WHERE ts = ?', [(row[0],) for row in rows])
+            record_alerts(cursor, rows)
+            # Readings archived by maintenance.py were folded into the anomaly
+            # state before they were deleted; restoring them only scores them
+            stored = {row[0] for row in previous}
+            restored = [row for row in rows if row[0] < cutoff and row[0] not in stored]
+            rescore_changed(cursor, previous, [row for row in rows if row[0] >= cutoff or row[0] in stored])
+            score_readings(cursor, restored, fold=False)
+            refresh_months(cursor, [row[0] for row in rows])
+        bump_day_versions(cursor, sorted({row[0] // SECONDS_PER_DAY for row in rows}))
+        count += len(rows)
+    # Encoded once, as re-encoding per batch would decode long schedules again each time
+    merge_doses(cursor, doses)
+    return count
+
+
+def export_archive(out_dir, patient=DEFAULT_PATIENT, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    counts = {name: export_table(conn, name, out_dir, patient) for name in TABLES}
+    conn.close()
+    return counts
+
+
+def import_archive(in_dir, patient=DEFAULT_PATIENT, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    counts = {name: import_table(conn, name, in_dir, patient) for name in TABLES}
+    conn.commit()
+    conn.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parquet export/import of the BP database')
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('directory')
+    parser.add_argument('--patient', default=DEFAULT_PATIENT)
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        counts = export_archive(args.directory, args.patient, args.db)
+        print(f"✓ Exported to {args.directory}")
+    else:
+        counts = import_archive(args.directory, args.patient, args.db)
+        print(f"✓ Imported from {args.directory}")
+    for name, count in counts.items():
+        print(f"  - {name}: {count} rows")
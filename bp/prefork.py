@@ -0,0 +1,128 @@
+"""Pre-forked serving: worker processes sharing one listening socket.
+
+`bp serve --workers N` runs the API in N processes, so reads scale with
+cores instead of sharing one interpreter lock. The parent
+
+1. imports the app (bringing the schema up to date) and commits whatever an
+   earlier run left in its ingest logs,
+2. builds and maps the hot snapshot (hot_snapshot.py), then
+3. opens the listening socket and forks the workers, restarting any that exits.
+
+Workers start with Flask, the routes and the snapshot mapping already in
+place, shared copy-on-write with the parent. Each runs a threaded server on
+the inherited socket (the kernel hands every connection to one of them),
+with its own ingest log and writer thread, ingest-<n>.log.
+
+A save answered by one worker bumps the shared generation; the others send
+their SSE subscribers a 'resync' when they see it change, so every open
+dashboard reloads. /metrics reports only the worker answering the scrape.
+"""
+import contextlib
+import glob
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+from .hot_snapshot import HotSnapshot
+from .ingest import IngestQueue
+
+# How often workers look for changes made by the others
+RESYNC_POLL_SECONDS = 1.0
+# Pause before replacing a worker that exited, so a crashing one cannot spin
+RESTART_SECONDS = 1.0
+
+
+def worker_log_path(log_path, worker):
+    root, ext = os.path.splitext(log_path)
+    return f'{root}-{worker}{ext}'
+
+
+def replay_ingest_logs(server):
+    """Commit the entries of every ingest log an earlier run left, then remove the logs"""
+    root, ext = os.path.splitext(server.INGEST_LOG_PATH)
+    for path in [server.INGEST_LOG_PATH] + sorted(glob.glob(f'{root}-*{ext}')):
+        if os.path.exists(path):
+            IngestQueue(server.DB_PATH, path, write=server.ingest_rows).replay()
+            os.remove(path)
+
+
+def watch_generation(broadcaster, generation):
+    """Send local SSE subscribers 'resync' whenever another worker commits a change"""
+    seen, own = generation.get(), generation.bumps
+    while True:
+        time.sleep(RESYNC_POLL_SECONDS)
+        current, bumps = generation.get(), generation.bumps
+        if current - seen > bumps - own:
+            broadcaster.publish('resync', {})
+        seen, own = current, bumps
+
+
+def run_worker(server, sock, worker):
+    server.start_ingest(worker_log_path(server.INGEST_LOG_PATH, worker))
+    threading.Thread(target=watch_generation, name='generation-watch', daemon=True,
+                     args=(server.broadcaster, server.hot_snapshot.generation)).start()
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, server.app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def serve(host='127.0.0.1', port=5001, workers=None):
+    from . import app as server
+
+    replay_ingest_logs(server)
+    snapshot = server.hot_snapshot = HotSnapshot(server.DB_PATH, server.hot_bodies)
+    snapshot.rebuild()
+    snapshot.map(snapshot.generation.get())
+
+    sock = socket.create_server((host, port), backlog=128)
+    workers = workers or os.cpu_count()
+    children = {}
+
+    def spawn(worker):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(server, sock, worker)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        children[pid] = worker
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            # Ctrl-C or a group kill has reached the workers too
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in range(workers):
+        spawn(worker)
+    print(f"✓ Serving http://{host}:{port} with {workers} workers", flush=True)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker = children.pop(pid, None)
+            if worker is not None and not stopping:
+                print(f"⚠ Worker {worker} exited (status {status}), restarting", flush=True)
+                time.sleep(RESTART_SECONDS)
+                if not stopping:
+                    spawn(worker)
+    finally:
+        sock.close()
+        snapshot.close()
@@ -0,0 +1,232 @@
+"""Materialized time-of-day profile of the readings.
+
+profile_cube has one cell per (month, weekday, half-hour slot) holding the
+count, sum, sum of squares, minimum and maximum of each metric over the
+readings in it. The time-of-day profile of any span of dates is the sum of the
+cells of the whole months inside the span, plus the same aggregates computed
+from the readings of the partial months at its ends, so a profile never
+rescans more than two months of readings.
+
+The database holds a single patient, so cells have no patient key. Writers
+call refresh_months() with the times of the readings they changed, which
+recomputes the cells of those months from the readings; recomputing rather
+than adjusting keeps minimum and maximum exact when readings are deleted.
+Months before the retention horizon (see maintenance.py) no longer have
+their readings, so their cells are kept as they were when archived.
+
+Run this module directly to rebuild the cube.
+"""
+import math
+import sqlite3
+import time
+from datetime import date, timedelta
+
+METRICS = ['systolic_bp', 'diastolic_bp', 'heart_rate']
+STATS = ['count', 'sum', 'sumsq', 'min', 'max']
+SLOT_SECONDS = 1800
+SLOTS = 86400 // SLOT_SECONDS
+
+CELL_COLUMNS = [f'{metric}_{stat}' for metric in METRICS for stat in STATS]
+
+# Aggregates of raw readings, in CELL_COLUMNS order
+READING_AGGREGATES = ', '.join(
+    f'COUNT({m}), SUM({m}), SUM({m} * {m}), MIN({m}), MAX({m})' for m in METRICS)
+
+# The same aggregates over cells
+CELL_AGGREGATES = ', '.join(
+    f'SUM({m}_count), SUM({m}_sum), SUM({m}_sumsq), MIN({m}_min), MAX({m}_max)' for m in METRICS)
+
+WEEKDAY = "CAST(strftime('%w', ts, 'unixepoch') AS INTEGER)"
+
+
+def ensure_profile_cube(conn):
+    """Create the cube, filling it from existing readings on first use"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_cube'")
+    exists = cursor.fetchone() is not None
+
+    columns = ',\n'.join(f'            {column} {"INTEGER" if column.endswith("_count") else "REAL"}'
+                         for column in CELL_COLUMNS)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS profile_cube (
+            month TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+{columns},
+            PRIMARY KEY (month, weekday, slot)
+        ) WITHOUT ROWID
+    ''')
+
+    if not exists:
+        rebuild_profile_cube(conn)
+    conn.commit()
+
+
+def month_of(ts):
+    """'YYYY-MM' of an epoch-seconds reading time"""
+    return time.strftime('%Y-%m', time.gmtime(ts))
+
+
+def archived_month(cursor):
+    """First month whose readings are still in the database ('' if none were archived)"""
+    cursor.execute('SELECT archived_before FROM retention')
+    row = cursor.fetchone()
+    return month_of(row[0]) if row else ''
+
+
+def refresh_months(cursor, ts_values):
+    """Recompute the cells of every month containing one of the given times"""
+    first = archived_month(cursor)
+    months = [(month,) for month in sorted({month_of(ts) for ts in ts_values}) if month >= first]
+    cursor.executemany('DELETE FROM profile_cube WHERE month = ?', months)
+    cursor.executemany(f'''
+        INSERT INTO profile_cube (month, weekday, slot, {', '.join(CELL_COLUMNS)})
+        SELECT ?1, {WEEKDAY}, ts % 86400 / {SLOT_SECONDS}, {READING_AGGREGATES}
+        FROM blood_pressure_readings
+        WHERE ts >= CAST(strftime('%s', ?1 || '-01') AS INTEGER)
+          AND ts < CAST(strftime('%s', ?1 || '-01', '+1 month') AS INTEGER)
+        GROUP BY 2, 3
+    ''', months)
+
+
+def rebuild_profile_cube(conn):
+    """Recompute every month that still has its readings"""
+    cursor = conn.cursor()
+    first = archived_month(cursor)
+    cursor.execute('DELETE FROM profile_cube WHERE month >= ?', (first,))
+    cursor.execute(f'''
+        INSERT INTO profile_cube (month, weekday, slot, {', '.join(CELL_COLUMNS)})
+        SELECT strftime('%Y-%m', ts, 'unixepoch'), {WEEKDAY}, ts % 86400 / {SLOT_SECONDS},
+               {READING_AGGREGATES}
+        FROM blood_pressure_readings
+        WHERE ts >= CAST(strftime('%s', ? || '-01') AS INTEGER)
+        GROUP BY 1, 2, 3
+    ''', (first or '0000-01',))
+
+
+def epoch(day):
+    return (day - date(1970, 1, 1)).days * 86400
+
+
+def split_span(start, end):
+    """Whole months ('YYYY-MM' first, last or None) and the partial [ts, ts) ranges of start..end"""
+    first_month = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    after_end = end + timedelta(days=1)
+    last_month_end = after_end.replace(day=1)
+    if first_month >= last_month_end:
+        return None, [(epoch(start), epoch(after_end))]
+
+    last_month = (last_month_end - timedelta(days=1)).replace(day=1)
+    partial = [(epoch(start), epoch(first_month)), (epoch(last_month_end), epoch(after_end))]
+    return (first_month.strftime('%Y-%m'), last_month.strftime('%Y-%m')), \
+        [bounds for bounds in partial if bounds[0] < bounds[1]]
+
+
+def load_profile(cursor, start=None, end=None, weekdays=None):
+    """Per-slot totals of each metric over the dates start..end (inclusive).
+
+    start and end are 'YYYY-MM-DD' (None: unbounded); weekdays filters by
+    day of week, 0 = Sunday. Returns {metric: {stat: [one value per slot]}}.
+    """
+    weekday_filter = ''
+    if weekdays is not None:
+        weekday_filter = f"AND weekday IN ({', '.join(str(int(day)) for day in weekdays)})"
+
+    if start is None or end is None:
+        # Archived months only have cells
+        cursor.execute('''
+            SELECT MIN(first), MAX(last) FROM (
+                SELECT MIN(ts) AS first, MAX(ts) AS last FROM blood_pressure_readings
+                UNION ALL
+                SELECT CAST(strftime('%s', MIN(month) || '-01') AS INTEGER),
+                       CAST(strftime('%s', MAX(month) || '-01') AS INTEGER)
+                FROM profile_cube
+            )
+        ''')
+        first_ts, last_ts = cursor.fetchone()
+        if first_ts is None:
+            return empty_profile()
+        start = start or time.strftime('%Y-%m-%d', time.gmtime(first_ts))
+        end = end or time.strftime('%Y-%m-%d', time.gmtime(last_ts))
+    months, partial = split_span(date.fromisoformat(start), date.fromisoformat(end))
+
+    parts = []
+    if months:
+        cursor.execute(f'''
+            SELECT slot, {CELL_AGGREGATES}
+            FROM profile_cube
+            WHERE month BETWEEN ? AND ? {weekday_filter}
+            GROUP BY slot
+        ''', months)
+        parts.extend(cursor.fetchall())
+    for bounds in partial:
+        cursor.execute(f'''
+            SELECT slot, {READING_AGGREGATES}
+            FROM (SELECT *, {WEEKDAY} AS weekday, ts % 86400 / {SLOT_SECONDS} AS slot
+                  FROM blood_pressure_readings
+                  WHERE ts >= ? AND ts < ?)
+            WHERE 1 {weekday_filter}
+            GROUP BY slot
+        ''', bounds)
+        parts.extend(cursor.fetchall())
+
+    profile = empty_profile()
+    for row in parts:
+        slot = row[0]
+        for i, metric in enumerate(METRICS):
+            totals = profile[metric]
+            count, total, sumsq, low, high = row[1 + i * 5:6 + i * 5]
+            if not count:
+                continue
+            totals['count'][slot] += count
+            totals['sum'][slot] += total
+            totals['sumsq'][slot] += sumsq
+            totals['min'][slot] = low if totals['min'][slot] is None else min(totals['min'][slot], low)
+            totals['max'][slot] = high if totals['max'][slot] is None else max(totals['max'][slot], high)
+    return profile
+
+
+def empty_profile():
+    return {metric: {'count': [0] * SLOTS, 'sum': [0.0] * SLOTS, 'sumsq': [0.0] * SLOTS,
+                     'min': [None] * SLOTS, 'max': [None] * SLOTS}
+            for metric in METRICS}
+
+
+def profile_stats(profile, slots_per_bin=1):
+    """Count, mean, standard deviation, min and max per bin of consecutive slots"""
+    stats = {}
+    for metric, totals in profile.items():
+        bins = {'count': [], 'mean': [], 'std': [], 'min': [], 'max': []}
+        for start in range(0, SLOTS, slots_per_bin):
+            window = slice(start, start + slots_per_bin)
+            count = sum(totals['count'][window])
+            bins['count'].append(count)
+            if not count:
+                for stat in ('mean', 'std', 'min', 'max'):
+                    bins[stat].append(None)
+                continue
+            mean = sum(totals['sum'][window]) / count
+            bins['mean'].append(mean)
+            bins['std'].append(math.sqrt(max(sum(totals['sumsq'][window]) / count - mean * mean, 0.0)))
+            bins['min'].append(min(value for value in totals['min'][window] if value is not None))
+            bins['max'].append(max(value for value in totals['max'][window] if value is not None))
+        stats[metric] = bins
+    return stats
+
+
+def slot_label(slot):
+    return f'{slot * SLOT_SECONDS // 3600:02d}:{slot * SLOT_SECONDS % 3600 // 60:02d}'
+
+
+if __name__ == '__main__':
+    from .db_schema import DB_PATH, ensure_schema
+
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+    rebuild_profile_cube(conn)
+    conn.commit()
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*), COUNT(DISTINCT month) FROM profile_cube')
+    cells, months = cursor.fetchone()
+    print(f"✓ Profile cube rebuilt: {cells} cells over {months} months")
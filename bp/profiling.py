@@ -0,0 +1,182 @@
+"""Stage timings, memory and CPU profiles for report and view generation.
+
+generate_report() and generate_view() mark where each stage starts with
+checkpoint(name), which does nothing unless a Profile is active (`bp report
+--profile`). An active Profile records each stage's wall time, the change in
+traced memory and its peak (tracemalloc), and for stages that allocated a lot
+the source lines responsible. Those lines come from comparing heap snapshots,
+which are only taken for such stages, so a stage's lines also include the
+(small) changes of the stages since the last one listed. Tracing allocations
+slows Python code down, so compare stage times with each other rather than
+with unprofiled runs.
+
+With an output prefix it also runs cProfile, saved as <prefix>.pstats, and
+samples the main thread's stack every few milliseconds into
+<prefix>.collapsed: one "stage;frame;...;frame count" line per distinct
+stack, the input format of flamegraph.pl, speedscope and inferno.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# The Profile collecting checkpoints, if any
+active = None
+
+# Only list the top allocating lines of stages whose traced memory changed by
+# at least this much; comparing snapshots takes seconds once plotly is loaded
+TOP_LINES_MIN_BYTES = 2 ** 20
+
+
+def checkpoint(name):
+    """Start the named stage, ending the previous one"""
+    if active is not None:
+        active.checkpoint(name)
+
+
+def frame_label(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled every `interval` seconds"""
+
+    def __init__(self, thread_id, profile, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.profile = profile
+        self.interval = interval
+        self.counts = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(self.profile.stage or 'profile')
+            key = ';'.join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f'{stack} {count}\n')
+
+
+class Profile:
+    """Context manager that profiles the code it wraps, then prints a summary"""
+
+    def __init__(self, output_prefix=None, top_lines=3, sample_interval=0.005):
+        self.output_prefix = output_prefix
+        self.top_lines = top_lines
+        self.sample_interval = sample_interval
+        self.stage = None
+        self.stages = []
+
+    def __enter__(self):
+        global active
+        tracemalloc.start()
+        # Traced bytes per source line at the last snapshot
+        self.line_sizes = {}
+        self.profiler = self.sampler = None
+        if self.output_prefix:
+            self.sampler = StackSampler(threading.get_ident(), self, self.sample_interval)
+            self.sampler.start()
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        self.checkpoint('imports')
+        active = self
+        return self
+
+    def checkpoint(self, name):
+        self.finish_stage()
+        self.stage = name
+        tracemalloc.reset_peak()
+        self.stage_memory = tracemalloc.get_traced_memory()[0]
+        self.stage_start = time.perf_counter()
+
+    def finish_stage(self):
+        if self.stage is None:
+            return
+        seconds = time.perf_counter() - self.stage_start
+        current, peak = tracemalloc.get_traced_memory()
+        name, self.stage = self.stage, '(profiler)'
+
+        top = []
+        if current - self.stage_memory >= TOP_LINES_MIN_BYTES:
+            top = self.top_allocations()
+
+        self.stages.append({
+            'stage': name,
+            'seconds': seconds,
+            'allocated': current - self.stage_memory,
+            'peak': peak,
+            'top': top
+        })
+        self.stage = None
+
+    def top_allocations(self):
+        """Lines that allocated the most since the last snapshot, which becomes this one"""
+        # Snapshots are slow; keep them out of the stage times, the CPU profile and the samples
+        if self.profiler is not None:
+            self.profiler.disable()
+        # Grouping a snapshot by line is the slow part, so each is grouped only
+        # once and diffed against the previous grouping (Snapshot.compare_to
+        # would group both)
+        line_sizes = {stat.traceback: stat.size
+                      for stat in tracemalloc.take_snapshot().statistics('lineno')}
+        growth = sorted(((size - self.line_sizes.get(traceback, 0), traceback)
+                         for traceback, size in line_sizes.items()), reverse=True)
+        top = []
+        for size_diff, traceback in growth:
+            if len(top) == self.top_lines or size_diff <= 0:
+                break
+            if traceback[0].filename not in (__file__, tracemalloc.__file__):
+                top.append((size_diff, traceback[0]))
+        self.line_sizes = line_sizes
+        if self.profiler is not None:
+            self.profiler.enable()
+        return top
+
+    def __exit__(self, *exc_info):
+        global active
+        active = None
+        self.finish_stage()
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        total = time.perf_counter() - self.start
+        tracemalloc.stop()
+
+        if self.output_prefix:
+            self.profiler.dump_stats(f'{self.output_prefix}.pstats')
+            self.sampler.write(f'{self.output_prefix}.collapsed')
+        self.print_summary(total)
+
+    def print_summary(self, total):
+        mb = 2 ** 20
+        # Shares of the profiled stages, not of the wall time with the snapshots
+        staged = sum(stage['seconds'] for stage in self.stages) or 1
+        print(f"\n{'stage':<34} {'seconds':>8} {'share':>6} {'alloc MB':>9} {'peak MB':>8}")
+        for stage in self.stages:
+            print(f"{stage['stage']:<34} {stage['seconds']:>8.3f} {stage['seconds'] / staged:>6.1%} "
+                  f"{stage['allocated'] / mb:>+9.1f} {stage['peak'] / mb:>8.1f}")
+            for size_diff, frame in stage['top']:
+                print(f"{'':<4}{size_diff / mb:>+7.1f} MB  {frame.filename}:{frame.lineno}")
+        print(f"{'total (incl. snapshots)':<34} {total:>8.3f}")
+        if self.output_prefix:
+            print(f"✓ CPU profile: {self.output_prefix}.pstats "
+                  f"(python -m pstats {self.output_prefix}.pstats)")
+            print(f"✓ Collapsed stacks: {self.output_prefix}.collapsed")
@@ -0,0 +1,286 @@
+// Web Worker for the windowed view: builds a date index over the readings once,
+// then answers window requests without touching the main thread.
+//
+// Messages in:
+//   { type: 'init', bpData, medData, allDates, dailyIndex, alertRules }
+//   { type: 'window', requestId, start, end, windowSize }
+//   { type: 'delta', bpReadings, medications, allDates, dailyIndex }
+//     (bpReadings/medications: { upserted: [records], deleted: [keys] })
+// Messages out:
+//   { type: 'window', requestId, ...window result }
+
+let bpData = [];
+let medData = [];
+let allDates = [];
+// Cumulative per-day totals from daily_index.py: totals for days [a, b) are
+// dailyIndex[field][b] - dailyIndex[field][a]
+let dailyIndex = null;
+
+// For allDates[i], records starts[i]..ends[i] (exclusive) of the sorted arrays
+// belong to that date, so any window is a contiguous slice found in O(1).
+let bpIndex = null;
+let medIndex = null;
+// Epoch milliseconds of each reading, parsed once
+let bpMillis = null;
+// 0/1 per reading: matched an alert rule that highlights that metric
+let systolicAlerts = null;
+let diastolicAlerts = null;
+let alertRules = [];
+
+function buildDateIndex(records, dates) {
+    const starts = new Int32Array(dates.length);
+    const ends = new Int32Array(dates.length);
+    let j = 0;
+    for (let i = 0; i < dates.length; i++) {
+        // Skip records for dates outside the index (e.g. medications on a day
+        // without readings)
+        while (j < records.length && records[j].date < dates[i]) j++;
+        starts[i] = j;
+        while (j < records.length && records[j].date === dates[i]) j++;
+        ends[i] = j;
+    }
+    return { starts, ends };
+}
+
+// Alert flags come from the rule names stored with each reading (alerts table)
+function buildAlertFlags(alertRules, metric) {
+    const names = new Set(alertRules
+        .filter(rule => rule.group === 'alert' && rule.highlight === metric)
+        .map(rule => rule.name));
+    return Uint8Array.from(bpData, d => d.alerts.some(name => names.has(name)) ? 1 : 0);
+}
+
+// Rebuild everything derived from the record arrays
+function reindex() {
+    bpIndex = buildDateIndex(bpData, allDates);
+    medIndex = buildDateIndex(medData, allDates);
+    bpMillis = Float64Array.from(bpData, d => toMillis(d.datetime));
+    systolicAlerts = buildAlertFlags(alertRules, 'systolic_bp');
+    diastolicAlerts = buildAlertFlags(alertRules, 'diastolic_bp');
+}
+
+// Drop deleted and replaced records, add the new versions, keep datetime order
+function applyRecordDelta(records, change, keyOf) {
+    const removed = new Set(change.deleted);
+    change.upserted.forEach(record => removed.add(keyOf(record)));
+    return records
+        .filter(record => !removed.has(keyOf(record)))
+        .concat(change.upserted)
+        .sort((a, b) => (a.datetime < b.datetime ? -1 : a.datetime > b.datetime ? 1 : 0));
+}
+
+function indexMean(metric, start, end) {
+    const count = dailyIndex[metric + '_count'][end] - dailyIndex[metric + '_count'][start];
+    const sum = dailyIndex[metric + '_sum'][end] - dailyIndex[metric + '_sum'][start];
+    return count > 0 ? sum / count : null;
+}
+
+// Naive 'YYYY-MM-DD HH:MM:SS' timestamp as epoch milliseconds, which is how
+// Plotly reads numeric values on a date axis
+function toMillis(datetime) {
+    return Date.UTC(
+        +datetime.substring(0, 4), +datetime.substring(5, 7) - 1, +datetime.substring(8, 10),
+        +datetime.substring(11, 13), +datetime.substring(14, 16), +datetime.substring(17, 19)
+    );
+}
+
+function orNaN(value) {
+    return value === null ? NaN : value;
+}
+
+function calculateMovingAverage(values, windowSizeDays) {
+    // Determine MA period based on window size
+    let maPeriod;
+    if (windowSizeDays < 5) {
+        return null; // Not enough data for meaningful MA
+    } else if (windowSizeDays <= 9) {
+        maPeriod = 3; // 3-day MA for small windows
+    } else {
+        maPeriod = 5; // 5-day MA for larger windows
+    }
+
+    if (values.length < maPeriod) {
+        return null; // Not enough data points
+    }
+
+    const maValues = new Float64Array(values.length);
+    for (let i = 0; i < values.length; i++) {
+        if (i < maPeriod - 1) {
+            maValues[i] = NaN; // Not enough preceding values
+        } else {
+            let sum = 0;
+            let count = 0;
+            for (let j = 0; j < maPeriod; j++) {
+                if (!Number.isNaN(values[i - j])) {
+                    sum += values[i - j];
+                    count++;
+                }
+            }
+            maValues[i] = count > 0 ? sum / count : NaN;
+        }
+    }
+    return { period: maPeriod, values: maValues };
+}
+
+// Trend series for one metric: x in epoch ms, y values and a 0/1 alert flag per
+// point, with a NaN gap between days so lines do not join across midnight
+function newSeries(size) {
+    return { x: new Float64Array(size), y: new Float64Array(size), alerts: new Uint8Array(size), length: 0 };
+}
+
+function pushPoint(series, x, y, alert) {
+    series.x[series.length] = x;
+    series.y[series.length] = y;
+    series.alerts[series.length] = alert ? 1 : 0;
+    series.length++;
+}
+
+function finishSeries(series) {
+    return {
+        x: series.x.slice(0, series.length),
+        y: series.y.slice(0, series.length),
+        alerts: series.alerts.slice(0, series.length)
+    };
+}
+
+function computeWindow(start, end, windowSize) {
+    const windowDates = allDates.slice(start, end);
+    const first = end > start ? bpIndex.starts[start] : 0;
+    const last = end > start ? bpIndex.ends[end - 1] : 0;
+    const readingCount = last - first;
+
+    // One point per reading plus at most one gap per day
+    const systolicSeries = newSeries(readingCount + windowDates.length);
+    const diastolicSeries = newSeries(readingCount + windowDates.length);
+
+    // Time-of-day values (6am-10pm) for the whole window; each day gets a view
+    const timeOfDay = {
+        times: new Float64Array(readingCount),
+        systolic: new Float64Array(readingCount),
+        diastolic: new Float64Array(readingCount)
+    };
+    let timeOfDayLength = 0;
+
+    const days = [];
+    const windowMed = [];
+
+    for (let idx = start; idx < end; idx++) {
+        const from = bpIndex.starts[idx], to = bpIndex.ends[idx];
+        const medFrom = medIndex.starts[idx], medTo = medIndex.ends[idx];
+
+        for (let m = medFrom; m < medTo; m++) windowMed.push(medData[m]);
+
+        const day = {
+            date: allDates[idx],
+            maxSystolic: null,
+            minDiastolic: null,
+            avgSystolic: indexMean('systolic', idx, idx + 1),
+            avgDiastolic: indexMean('diastolic', idx, idx + 1),
+            avgHR: indexMean('heart_rate', idx, idx + 1),
+            timeStrings: []
+        };
+        const dayStart = timeOfDayLength;
+
+        if (to > from && systolicSeries.length > 0) {
+            pushPoint(systolicSeries, NaN, NaN, false);
+            pushPoint(diastolicSeries, NaN, NaN, false);
+        }
+
+        for (let i = from; i < to; i++) {
+            const d = bpData[i];
+            const hour = parseInt(d.time.substring(0, 2), 10);
+
+            if (d.systolic !== null) {
+                if (!day.maxSystolic || d.systolic > day.maxSystolic.value) {
+                    day.maxSystolic = { value: d.systolic, datetime: d.datetime };
+                }
+            }
+            if (d.diastolic !== null) {
+                // Minimum among morning readings only (<= 1pm)
+                if (hour <= 13 && (!day.minDiastolic || d.diastolic < day.minDiastolic.value)) {
+                    day.minDiastolic = { value: d.diastolic, datetime: d.datetime };
+                }
+            }
+
+            pushPoint(systolicSeries, bpMillis[i], orNaN(d.systolic), systolicAlerts[i]);
+            pushPoint(diastolicSeries, bpMillis[i], orNaN(d.diastolic), diastolicAlerts[i]);
+
+            if (hour >= 6 && hour <= 22) {
+                const minutes = parseInt(d.time.substring(3, 5), 10);
+                timeOfDay.times[timeOfDayLength] = hour + minutes / 60;
+                timeOfDay.systolic[timeOfDayLength] = orNaN(d.systolic);
+                timeOfDay.diastolic[timeOfDayLength] = orNaN(d.diastolic);
+                day.timeStrings.push(d.time);
+                timeOfDayLength++;
+            }
+        }
+
+        day.times = timeOfDay.times.subarray(dayStart, timeOfDayLength);
+        day.systolic = timeOfDay.systolic.subarray(dayStart, timeOfDayLength);
+        day.diastolic = timeOfDay.diastolic.subarray(dayStart, timeOfDayLength);
+        days.push(day);
+    }
+
+    // Daily average trend (days with any BP value) plus moving averages
+    const avgDays = days.filter(d => d.avgSystolic !== null || d.avgDiastolic !== null);
+    const avgSystolicValues = Float64Array.from(avgDays, d => orNaN(d.avgSystolic));
+    const avgDiastolicValues = Float64Array.from(avgDays, d => orNaN(d.avgDiastolic));
+
+    return {
+        windowDates: windowDates,
+        firstDatetime: readingCount > 0 ? bpData[first].datetime : '',
+        lastDatetime: readingCount > 0 ? bpData[last - 1].datetime : '',
+        days: days,
+        systolicSeries: finishSeries(systolicSeries),
+        diastolicSeries: finishSeries(diastolicSeries),
+        dailyAvg: {
+            dates: avgDays.map(d => d.date),
+            systolic: avgSystolicValues,
+            diastolic: avgDiastolicValues,
+            maSystolic: calculateMovingAverage(avgSystolicValues, windowSize),
+            maDiastolic: calculateMovingAverage(avgDiastolicValues, windowSize)
+        },
+        windowMed: windowMed,
+        // Backing buffers of the typed arrays, moved to the page without copying
+        transfer: [
+            timeOfDay.times.buffer, timeOfDay.systolic.buffer, timeOfDay.diastolic.buffer
+        ]
+    };
+}
+
+function transferList(result) {
+    const buffers = result.transfer;
+    delete result.transfer;
+    [result.systolicSeries, result.diastolicSeries].forEach(series => {
+        buffers.push(series.x.buffer, series.y.buffer, series.alerts.buffer);
+    });
+    buffers.push(result.dailyAvg.systolic.buffer, result.dailyAvg.diastolic.buffer);
+    [result.dailyAvg.maSystolic, result.dailyAvg.maDiastolic].forEach(ma => {
+        if (ma !== null) buffers.push(ma.values.buffer);
+    });
+    return buffers;
+}
+
+self.onmessage = function (event) {
+    const msg = event.data;
+    if (msg.type === 'init') {
+        bpData = msg.bpData;
+        medData = msg.medData;
+        allDates = msg.allDates;
+        dailyIndex = msg.dailyIndex;
+        alertRules = msg.alertRules;
+        reindex();
+    } else if (msg.type === 'delta') {
+        bpData = applyRecordDelta(bpData, msg.bpReadings, d => d.datetime);
+        medData = applyRecordDelta(medData, msg.medications, m => m.datetime + '|' + m.medication);
+        allDates = msg.allDates;
+        dailyIndex = msg.dailyIndex;
+        reindex();
+    } else if (msg.type === 'window') {
+        const result = computeWindow(msg.start, msg.end, msg.windowSize);
+        result.type = 'window';
+        result.requestId = msg.requestId;
+        const transfer = transferList(result);
+        self.postMessage(result, transfer);
+    }
+};
@@ -0,0 +1,769 @@
+import pandas as pd
+import json
+import os
+from .alert_rules import client_rules, rules_in_group
+from .column_cache import load_cache, medications_frame, readings_frame
+from .profiling import checkpoint
+
+
+def generate_view(output_path='bp_windowed_view.html'):
+    """Build the self-contained windowed view page from the database"""
+    # Load data from the memory-mapped column cache (rebuilt only when the DB changes),
+    # with the names of the alert rules each reading matched
+    checkpoint('load column cache')
+    cache = load_cache()
+    checkpoint('build data frames')
+    bp_df = readings_frame(cache)
+    med_df = medications_frame(cache)
+    daily_index = cache['daily_index']
+
+    # Prepare data for JavaScript
+    checkpoint('prepare page data')
+    bp_data = []
+    for _, row in bp_df.iterrows():
+        bp_data.append({
+            'datetime': row['datetime'].strftime('%Y-%m-%d %H:%M:%S'),
+            'date': row['datetime'].strftime('%Y-%m-%d'),
+            'time': row['datetime'].strftime('%H:%M'),
+            'systolic': int(row['systolic_bp']) if pd.notna(row['systolic_bp']) else None,
+            'diastolic': int(row['diastolic_bp']) if pd.notna(row['diastolic_bp']) else None,
+            'heart_rate': int(row['heart_rate']) if pd.notna(row['heart_rate']) else None,
+            'alerts': row['alerts']
+        })
+
+    med_data = []
+    for _, row in med_df.iterrows():
+        med_data.append({
+            'datetime': row['datetime'].strftime('%Y-%m-%d %H:%M:%S'),
+            'date': row['datetime'].strftime('%Y-%m-%d'),
+            'time': row['datetime'].strftime('%H:%M'),
+            'medication': row['medication_name'],
+            'dosage': float(row['dosage'])
+        })
+
+    dates_list = daily_index['dates']
+    alert_rules = client_rules()
+
+    # Legend entries for the rules that drive the red highlights
+    alert_legend = ''.join(f"""
+            <div class="legend-item">
+                <span class="legend-color" style="background-color: {rule['color']};"></span>
+                <span>{rule['label']}</span>
+            </div>""" for rule in rules_in_group('alert'))
+
+    # Window statistics run in a Web Worker; inline its source so the page stays self-contained
+    worker_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'bp_window_worker.js')
+    with open(worker_path, encoding='utf-8') as f:
+        worker_js = f.read()
+
+    # Create HTML
+    checkpoint('render page')
+    html_content = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Blood Pressure 5-Day Window View</title>
+    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <style>
+        body {{
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }}
+        .container {{
+            max-width: 1600px;
+            margin: 0 auto;
+            background-color: white;
+            padding: 30px;
+            border-radius: 10px;
+            box-shadow: 0 0 10px rgba(0,0,0,0.1);
+        }}
+        h1 {{
+            color: #2c3e50;
+            margin-bottom: 10px;
+        }}
+        .controls {{
+            display: flex;
+            align-items: center;
+            gap: 20px;
+            margin: 20px 0;
+            padding: 20px;
+            background-color: #f8f9fa;
+            border-radius: 8px;
+        }}
+        .nav-buttons {{
+            display: flex;
+            gap: 10px;
+        }}
+        button {{
+            padding: 12px 24px;
+            font-size: 18px;
+            font-weight: bold;
+            border: none;
+            border-radius: 6px;
+            cursor: pointer;
+            background-color: #3498db;
+            color: white;
+            transition: background-color 0.3s;
+        }}
+        button:hover {{
+            background-color: #2980b9;
+        }}
+        button:disabled {{
+            background-color: #bdc3c7;
+            cursor: not-allowed;
+        }}
+        .date-range {{
+            font-size: 18px;
+            font-weight: bold;
+            color: #34495e;
+            padding: 10px 20px;
+            background-color: white;
+            border-radius: 6px;
+            border: 2px solid #3498db;
+        }}
+        .legend {{
+            margin: 20px 0;
+            padding: 15px;
+            background-color: #fff3cd;
+            border-radius: 6px;
+            border-left: 4px solid #ffc107;
+        }}
+        .legend-item {{
+            display: inline-block;
+            margin-right: 20px;
+        }}
+        .legend-color {{
+            display: inline-block;
+            width: 20px;
+            height: 20px;
+            border-radius: 50%;
+            margin-right: 5px;
+            vertical-align: middle;
+        }}
+        #chart {{
+            margin: 20px 0;
+        }}
+        #medications {{
+            margin: 20px 0;
+        }}
+        .stats {{
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 15px;
+            margin: 20px 0;
+        }}
+        .stat-box {{
+            padding: 15px;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            border-radius: 8px;
+            text-align: center;
+        }}
+        .stat-box h3 {{
+            margin: 0 0 5px 0;
+            font-size: 14px;
+            opacity: 0.9;
+        }}
+        .stat-box .value {{
+            font-size: 28px;
+            font-weight: bold;
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>📊 Blood Pressure 5-Day Window View</h1>
+
+        <div class="legend">
+            <strong>🎯 Alert Thresholds:</strong>{alert_legend}
+            <div class="legend-item">
+                <span class="legend-color" style="background-color: #3498db;"></span>
+                <span>✓ Normal Range</span>
+            </div>
+        </div>
+
+        <div class="stats" id="stats"></div>
+
+        <div class="controls" style="justify-content: space-between; align-items: center;">
+            <div id="dateRange" style="font-size: 18px; font-weight: bold; color: #2c3e50; padding: 10px 20px; background-color: #e8f4f8; border-radius: 6px; border-left: 4px solid #3498db;"></div>
+            <div style="display: flex; align-items: center; gap: 20px;">
+                <div style="display: flex; align-items: center; gap: 15px;">
+                    <div style="font-weight: bold; color: #34495e;">Window Size:</div>
+                    <button onclick="changeWindowSize(-1)" style="padding: 8px 16px;">-</button>
+                    <div id="windowSizeDisplay" style="font-size: 18px; font-weight: bold; min-width: 60px; text-align: center; color: #3498db;">5 days</div>
+                    <button onclick="changeWindowSize(1)" style="padding: 8px 16px;">+</button>
+                </div>
+                <div style="width: 2px; height: 40px; background-color: #bdc3c7;"></div>
+                <div style="display: flex; align-items: center; gap: 10px;">
+                    <div style="font-weight: bold; color: #34495e;">Navigate:</div>
+                    <button id="prevBtn" onclick="moveWindow(-1)">← Prev</button>
+                    <button id="nextBtn" onclick="moveWindow(1)">Next →</button>
+                </div>
+            </div>
+        </div>
+
+        <div id="chart1" style="min-height: 500px; margin-top: 20px;"></div>
+        <div id="chart2" style="min-height: 500px; margin-top: 10px; margin-bottom: 20px;"></div>
+
+        <h2 style="margin-top: 40px; margin-bottom: 20px; color: #27ae60; border-bottom: 2px solid #27ae60; padding-bottom: 10px;">
+            📈 Daily Pattern Analysis (Time of Day)
+        </h2>
+
+        <div id="chart3" style="min-height: 500px; margin-top: 20px;"></div>
+        <div id="chart4" style="min-height: 500px; margin-top: 10px; margin-bottom: 20px;"></div>
+
+        <h2 style="margin-top: 40px; margin-bottom: 20px; color: #9b59b6; border-bottom: 2px solid #9b59b6; padding-bottom: 10px;">
+            📊 Daily Blood Pressure Range Trend
+        </h2>
+        <div id="chart5" style="min-height: 400px; margin-top: 20px; margin-bottom: 30px;"></div>
+
+        <div id="medications"></div>
+    </div>
+
+    <script id="windowWorkerSource" type="javascript/worker">
+{worker_js}
+    </script>
+
+    <script>
+        const bpData = {json.dumps(bp_data)};
+        const medData = {json.dumps(med_data)};
+        const allDates = {json.dumps(dates_list)};
+        const dailyIndex = {json.dumps(daily_index)};
+        const alertRules = {json.dumps(alert_rules)};
+
+        // Window statistics are computed off the main thread by a Web Worker that
+        // keeps a date index over the readings (see bp_window_worker.js)
+        const windowWorker = new Worker(URL.createObjectURL(new Blob(
+            [document.getElementById('windowWorkerSource').textContent],
+            {{ type: 'text/javascript' }}
+        )));
+        let latestRequestId = 0;
+
+        windowWorker.onmessage = event => {{
+            // Drop results for windows the user has already moved past
+            if (event.data.requestId === latestRequestId) {{
+                renderWindow(event.data);
+            }}
+        }};
+        windowWorker.postMessage({{ type: 'init', bpData, medData, allDates, dailyIndex, alertRules }});
+
+        let currentWindowStart = 0;
+        let windowSize = 5;
+
+        function changeWindowSize(delta) {{
+            const newSize = windowSize + delta;
+            if (newSize >= 1 && newSize <= allDates.length) {{
+                windowSize = newSize;
+                // Adjust window start if needed
+                if (currentWindowStart + windowSize > allDates.length) {{
+                    currentWindowStart = Math.max(0, allDates.length - windowSize);
+                }}
+                document.getElementById('windowSizeDisplay').textContent = `${{windowSize}} day${{windowSize !== 1 ? 's' : ''}}`;
+                updateView();
+            }}
+        }}
+
+        function updateView() {{
+            const startIdx = currentWindowStart;
+            const endIdx = Math.min(currentWindowStart + windowSize, allDates.length);
+
+            // Update date range display
+            document.getElementById('dateRange').textContent =
+                `${{allDates[startIdx]}} to ${{allDates[endIdx - 1]}}`;
+
+            // Update button states
+            document.getElementById('prevBtn').disabled = currentWindowStart === 0;
+            document.getElementById('nextBtn').disabled = currentWindowStart + windowSize >= allDates.length;
+
+            // Stat cards are O(1) from the daily index; the charts follow from the worker
+            renderStats(windowStats(startIdx, endIdx));
+
+            latestRequestId++;
+            windowWorker.postMessage({{
+                type: 'window',
+                requestId: latestRequestId,
+                start: startIdx,
+                end: endIdx,
+                windowSize: windowSize
+            }});
+        }}
+
+        // Window statistics are differences of two prefix entries in the daily index
+        function windowStats(start, end) {{
+            const total = field => dailyIndex[field][end] - dailyIndex[field][start];
+            const mean = metric => {{
+                const count = total(metric + '_count');
+                return count > 0 ? total(metric + '_sum') / count : null;
+            }};
+            return {{
+                readings: total('readings'),
+                avgSystolic: mean('systolic'),
+                avgDiastolic: mean('diastolic'),
+                avgHR: mean('heart_rate'),
+                alerts: total('alerts')
+            }};
+        }}
+
+        function formatAvg(value) {{
+            return value !== null ? value.toFixed(1) : 'N/A';
+        }}
+
+        function renderStats(stats) {{
+            document.getElementById('stats').innerHTML = `
+                <div class="stat-box">
+                    <h3>Readings</h3>
+                    <div class="value">${{stats.readings}}</div>
+                </div>
+                <div class="stat-box" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
+                    <h3>Avg 收缩压 (Systolic)</h3>
+                    <div class="value">${{formatAvg(stats.avgSystolic)}}</div>
+                </div>
+                <div class="stat-box" style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);">
+                    <h3>Avg 舒张压 (Diastolic)</h3>
+                    <div class="value">${{formatAvg(stats.avgDiastolic)}}</div>
+                </div>
+                <div class="stat-box" style="background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%);">
+                    <h3>Avg Heart Rate</h3>
+                    <div class="value">${{formatAvg(stats.avgHR)}}</div>
+                </div>
+                <div class="stat-box" style="background: linear-gradient(135deg, #fa709a 0%, #fee140 100%);">
+                    <h3>🚨 Alerts</h3>
+                    <div class="value">${{stats.alerts}}</div>
+                </div>
+            `;
+        }}
+
+        // Every chart is a persistent Plotly instance. Its trace and layout objects
+        // are built once below, updated in place for each window and redrawn with
+        // Plotly.react. Charts outside the viewport are only marked dirty and
+        // catch up when they scroll into view.
+        const chartConfig = {{ responsive: true }};
+        const figures = {{}};
+        const visibleCharts = new Set();
+        const dirtyCharts = new Set();
+
+        function drawChart(id) {{
+            const figure = figures[id];
+            // Trace arrays are swapped in place, so tell Plotly.react to re-read them
+            figure.layout.datarevision = (figure.layout.datarevision || 0) + 1;
+            Plotly.react(id, figure.data, figure.layout, chartConfig);
+            dirtyCharts.delete(id);
+        }}
+
+        function updateChart(id) {{
+            if (visibleCharts.has(id)) {{
+                drawChart(id);
+            }} else {{
+                dirtyCharts.add(id);
+            }}
+        }}
+
+        const chartObserver = new IntersectionObserver(entries => {{
+            entries.forEach(entry => {{
+                const id = entry.target.id;
+                if (entry.isIntersecting) {{
+                    visibleCharts.add(id);
+                    if (dirtyCharts.has(id)) drawChart(id);
+                }} else {{
+                    visibleCharts.delete(id);
+                }}
+            }});
+        }}, {{ rootMargin: '200px 0px' }});
+
+        // Marker colour from the worker's 0/1 alert flags
+        const alertColorscale = [[0, '#3498db'], [1, '#e74c3c']];
+
+        function peakAnnotation(peak, color, ay) {{
+            return {{
+                x: peak.datetime,
+                y: peak.value,
+                text: `<b>${{peak.value}}</b>`,
+                showarrow: true,
+                arrowhead: 2,
+                arrowsize: 1,
+                arrowwidth: 2,
+                arrowcolor: color,
+                ax: 0,
+                ay: ay,
+                bgcolor: '#fff',
+                bordercolor: color,
+                borderwidth: 2,
+                borderpad: 4,
+                font: {{ color: color, size: 12, weight: 'bold' }}
+            }};
+        }}
+
+        // Chart 1: Systolic Blood Pressure (收缩压)
+        figures.chart1 = {{
+            data: [{{
+                x: [],
+                y: [],
+                mode: 'lines+markers',
+                name: '收缩压 (Systolic)',
+                line: {{
+                    color: '#e74c3c',
+                    width: 2.5,
+                    shape: 'spline',
+                    smoothing: 1.3
+                }},
+                marker: {{
+                    size: 8,
+                    color: [],
+                    colorscale: alertColorscale,
+                    cmin: 0,
+                    cmax: 1,
+                    line: {{ color: '#fff', width: 1.5 }}
+                }},
+                connectgaps: false,
+                hovertemplate: '<b>收缩压</b><br>%{{x}}<br><b>%{{y}} mmHg</b><extra></extra>'
+            }}],
+            layout: {{
+                height: 500,
+                hovermode: 'closest',
+                margin: {{ t: 20, b: 50, l: 60, r: 20 }},
+                xaxis: {{
+                    title: 'Date & Time',
+                    type: 'date',
+                    gridcolor: '#e0e0e0'
+                }},
+                yaxis: {{
+                    title: '收缩压 (mmHg)',
+                    gridcolor: '#e0e0e0',
+                    range: [90, 165]
+                }},
+                shapes: [
+                    {{
+                        type: 'line',
+                        x0: '',
+                        x1: '',
+                        y0: 140,
+                        y1: 140,
+                        line: {{ color: '#e74c3c', width: 3, dash: 'dash' }},
+                        yref: 'y'
+                    }},
+                    {{
+                        type: 'rect',
+                        x0: '',
+                        x1: '',
+                        y0: 140,
+                        y1: 165,
+                        fillcolor: '#e74c3c',
+                        opacity: 0.1,
+                        line: {{ width: 0 }}
+                    }}
+                ],
+                annotations: []
+            }}
+        }};
+
+        // Chart 2: Diastolic Blood Pressure (舒张压)
+        figures.chart2 = {{
+            data: [{{
+                x: [],
+                y: [],
+                mode: 'lines+markers',
+                name: '舒张压 (Diastolic)',
+                line: {{
+                    color: '#3498db',
+                    width: 2.5,
+                    shape: 'spline',
+                    smoothing: 1.3
+                }},
+                marker: {{
+                    size: 8,
+                    color: [],
+                    colorscale: alertColorscale,
+                    cmin: 0,
+                    cmax: 1,
+                    line: {{ color: '#fff', width: 1.5 }}
+                }},
+                connectgaps: false,
+                hovertemplate: '<b>舒张压</b><br>%{{x}}<br><b>%{{y}} mmHg</b><extra></extra>'
+            }}],
+            layout: {{
+                height: 500,
+                hovermode: 'closest',
+                margin: {{ t: 20, b: 50, l: 60, r: 20 }},
+                xaxis: {{
+                    title: 'Date & Time',
+                    type: 'date',
+                    gridcolor: '#e0e0e0'
+                }},
+                yaxis: {{
+                    title: '舒张压 (mmHg)',
+                    gridcolor: '#e0e0e0',
+                    range: [45, 85]
+                }},
+                shapes: [
+                    {{
+                        type: 'line',
+                        x0: '',
+                        x1: '',
+                        y0: 57,
+                        y1: 57,
+                        line: {{ color: '#e74c3c', width: 3, dash: 'dash' }},
+                        yref: 'y'
+                    }},
+                    {{
+                        type: 'rect',
+                        x0: '',
+                        x1: '',
+                        y0: 45,
+                        y1: 57,
+                        fillcolor: '#e74c3c',
+                        opacity: 0.1,
+                        line: {{ width: 0 }}
+                    }}
+                ],
+                annotations: []
+            }}
+        }};
+
+        // Charts 3 and 4: one time-of-day trace per date, pooled across windows
+        function seasonalLayout(title, range, alertY0, alertY1, alertLine) {{
+            return {{
+                height: 500,
+                hovermode: 'closest',
+                margin: {{ t: 20, b: 50, l: 60, r: 20 }},
+                xaxis: {{
+                    title: 'Time of Day',
+                    gridcolor: '#e0e0e0',
+                    range: [6, 22],
+                    tickmode: 'array',
+                    tickvals: [6, 8, 10, 12, 14, 16, 18, 20, 22],
+                    ticktext: ['06:00', '08:00', '10:00', '12:00', '14:00', '16:00', '18:00', '20:00', '22:00']
+                }},
+                yaxis: {{
+                    title: title,
+                    gridcolor: '#e0e0e0',
+                    range: range
+                }},
+                shapes: [
+                    {{
+                        type: 'line',
+                        x0: 0,
+                        x1: 1,
+                        xref: 'paper',
+                        y0: alertLine,
+                        y1: alertLine,
+                        line: {{ color: '#e74c3c', width: 3, dash: 'dash' }}
+                    }},
+                    {{
+                        type: 'rect',
+                        x0: 0,
+                        x1: 1,
+                        xref: 'paper',
+                        y0: alertY0,
+                        y1: alertY1,
+                        fillcolor: '#e74c3c',
+                        opacity: 0.1,
+                        line: {{ width: 0 }}
+                    }}
+                ],
+                showlegend: true,
+                legend: {{
+                    title: {{ text: 'Dates (darker = older)' }},
+                    orientation: 'v',
+                    x: 1.02,
+                    y: 1
+                }}
+            }};
+        }}
+
+        figures.chart3 = {{ data: [], layout: seasonalLayout('收缩压 (mmHg)', [90, 165], 140, 165, 140) }};
+        figures.chart4 = {{ data: [], layout: seasonalLayout('舒张压 (mmHg)', [45, 85], 45, 57, 57) }};
+        const seasonalPools = {{ chart3: [], chart4: [] }};
+
+        function seasonalTrace(chartId, idx) {{
+            const pool = seasonalPools[chartId];
+            if (!pool[idx]) {{
+                pool[idx] = {{
+                    x: [],
+                    y: [],
+                    mode: 'lines+markers',
+                    line: {{
+                        width: 2,
+                        shape: 'spline',
+                        smoothing: 1.3
+                    }},
+                    marker: {{
+                        size: 6
+                    }},
+                    text: []
+                }};
+            }}
+            return pool[idx];
+        }}
+
+        // Chart 5: Daily BP Range (Max Systolic - Min Diastolic)
+        figures.chart5 = {{
+            data: [{{
+                x: [],
+                y: [],
+                mode: 'lines+markers',
+                name: 'BP Range',
+                line: {{
+                    color: '#9b59b6',
+                    width: 3,
+                    shape: 'spline',
+                    smoothing: 1.3
+                }},
+                marker: {{
+                    size: 10,
+                    color: '#9b59b6',
+                    line: {{ color: '#fff', width: 2 }}
+                }},
+                hovertemplate: '<b>%{{x}}</b><br>Range: %{{y}} mmHg<br>(Max 收缩压 - Min 舒张压)<extra></extra>'
+            }}],
+            layout: {{
+                height: 400,
+                hovermode: 'closest',
+                margin: {{ t: 20, b: 50, l: 60, r: 20 }},
+                xaxis: {{
+                    title: 'Date',
+                    gridcolor: '#e0e0e0'
+                }},
+                yaxis: {{
+                    title: 'BP Range (mmHg)',
+                    gridcolor: '#e0e0e0'
+                }},
+                showlegend: false
+            }}
+        }};
+
+        Object.keys(figures).forEach(id => chartObserver.observe(document.getElementById(id)));
+
+        // Value of the alert rule that highlights a metric, for the guide lines
+        function alertThreshold(metric) {{
+            const rule = alertRules.find(r => r.group === 'alert' && r.highlight === metric);
+            return (rule.all || rule.any).find(condition => condition[0] === metric)[2];
+        }}
+
+        function applyAlertThresholds() {{
+            const systolic = alertThreshold('systolic_bp');
+            const diastolic = alertThreshold('diastolic_bp');
+            [figures.chart1, figures.chart3].forEach(figure => {{
+                const [line, band] = figure.layout.shapes;
+                line.y0 = line.y1 = systolic;
+                band.y0 = systolic;
+            }});
+            [figures.chart2, figures.chart4].forEach(figure => {{
+                const [line, band] = figure.layout.shapes;
+                line.y0 = line.y1 = diastolic;
+                band.y1 = diastolic;
+            }});
+        }}
+
+        function setShapeSpan(layout, x0, x1) {{
+            layout.shapes.forEach(shape => {{
+                shape.x0 = x0;
+                shape.x1 = x1;
+            }});
+        }}
+
+        function renderWindow(result) {{
+            // Chart 1: Systolic Blood Pressure (收缩压)
+            const systolicTrace = figures.chart1.data[0];
+            systolicTrace.x = result.systolicSeries.x;
+            systolicTrace.y = result.systolicSeries.y;
+            systolicTrace.marker.color = result.systolicSeries.alerts;
+            setShapeSpan(figures.chart1.layout, result.firstDatetime, result.lastDatetime);
+            figures.chart1.layout.annotations = result.days
+                .filter(day => day.maxSystolic)
+                .map(day => peakAnnotation(day.maxSystolic, '#c0392b', -30));
+            updateChart('chart1');
+
+            // Chart 2: Diastolic Blood Pressure (舒张压)
+            const diastolicTrace = figures.chart2.data[0];
+            diastolicTrace.x = result.diastolicSeries.x;
+            diastolicTrace.y = result.diastolicSeries.y;
+            diastolicTrace.marker.color = result.diastolicSeries.alerts;
+            setShapeSpan(figures.chart2.layout, result.firstDatetime, result.lastDatetime);
+            figures.chart2.layout.annotations = result.days
+                .filter(day => day.minDiastolic)
+                .map(day => peakAnnotation(day.minDiastolic, '#2980b9', 30));
+            updateChart('chart2');
+
+            // Charts 3 and 4: time-of-day traces, green gradient (darker = older date)
+            const numDays = result.days.length;
+            let traceCount = 0;
+            result.days.forEach((day, idx) => {{
+                if (day.times.length === 0) return;
+                const date = day.date;
+
+                // Calculate green shade (older = darker, newer = lighter)
+                const greenIntensity = 255 - Math.floor((idx / Math.max(numDays - 1, 1)) * 100); // 155-255
+                const greenColor = `rgb(0, ${{greenIntensity}}, 0)`;
+
+                [['chart3', day.systolic, '收缩压'], ['chart4', day.diastolic, '舒张压']].forEach(([chartId, values, label]) => {{
+                    const trace = seasonalTrace(chartId, traceCount);
+                    trace.x = day.times;
+                    trace.y = values;
+                    trace.name = date;
+                    trace.line.color = greenColor;
+                    trace.marker.color = greenColor;
+                    trace.text = day.timeStrings;
+                    trace.hovertemplate = `<b>${{date}}</b><br>Time: %{{text}}<br>${{label}}: %{{y}} mmHg<extra></extra>`;
+                }});
+                traceCount++;
+            }});
+            figures.chart3.data = seasonalPools.chart3.slice(0, traceCount);
+            figures.chart4.data = seasonalPools.chart4.slice(0, traceCount);
+            updateChart('chart3');
+            updateChart('chart4');
+
+            // Chart 5: Daily BP Range (Max Systolic - Min Diastolic)
+            const rangeDays = result.days.filter(day => day.maxSystolic && day.minDiastolic);
+            const rangeTrace = figures.chart5.data[0];
+            rangeTrace.x = rangeDays.map(day => day.date);
+            rangeTrace.y = Float64Array.from(rangeDays, day => day.maxSystolic.value - day.minDiastolic.value);
+            updateChart('chart5');
+
+            // Display medications
+            const windowMed = result.windowMed;
+            if (windowMed.length > 0) {{
+                let medHTML = '<h2>💊 Medications Taken in This Period</h2><div style="background: #f8f9fa; padding: 15px; border-radius: 8px;">';
+                windowMed.forEach(m => {{
+                    medHTML += `<div style="margin: 8px 0; padding: 10px; background: white; border-radius: 4px; border-left: 4px solid #9b59b6;">
+                        <strong>${{m.datetime}}</strong> - ${{m.medication}}: <strong>${{m.dosage}}</strong>
+                    </div>`;
+                }});
+                medHTML += '</div>';
+                document.getElementById('medications').innerHTML = medHTML;
+            }} else {{
+                document.getElementById('medications').innerHTML = '<p style="color: #7f8c8d;">No medications recorded in this period.</p>';
+            }}
+        }}
+
+        function moveWindow(direction) {{
+            const newStart = currentWindowStart + direction;
+            if (newStart >= 0 && newStart < allDates.length) {{
+                currentWindowStart = newStart;
+                updateView();
+            }}
+        }}
+
+        // Initialize
+        applyAlertThresholds();
+        updateView();
+    </script>
+</body>
+</html>
+"""
+
+    # Save HTML file
+    checkpoint('write file')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+
+    print("✓ Windowed view created!")
+    print(f"✓ Report generated: {output_path}")
+    print("\nFeatures:")
+    print("  - 5-day sliding window")
+    print("  - Previous/Next navigation buttons")
+    print("  - Red markers for 收缩压 > 140 or 舒张压 < 57")
+    print("  - Statistics for each window")
+    print("  - Medication timeline")
+    print(f"\nOpen {output_path} in your browser to view.")
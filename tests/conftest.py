@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """bp.app serving a fresh database in tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    from bp import app as app_module
+    monkeypatch.setattr(app_module, 'DB_PATH', str(tmp_path / 'patient_bp.db'))
+    monkeypatch.setattr(app_module, 'ingest_queue', None)
+    app_module.init_db()
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def synthetic_db(tmp_path):
+    """A year of synthetic readings and doses from 2024-01-01, as a database path"""
+    from benchmarks.synthetic import write_database
+    path = str(tmp_path / 'synthetic.db')
+    write_database(path, seed=0, days=365)
+    return path
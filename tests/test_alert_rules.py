@@ -0,0 +1,51 @@
+import json
+import sqlite3
+
+import numpy as np
+
+from bp.alert_rules import compile_rule, evaluate, load_rules, threshold
+from bp.db_schema import to_epoch
+
+
+def test_rules_compile_to_column_predicates(tmp_path):
+    columns = {'systolic_bp': np.array([110.0, 125.0, 135.0, np.nan]),
+               'diastolic_bp': np.array([70.0, 85.0, 75.0, 90.0])}
+    both = compile_rule({'all': [['systolic_bp', '>=', 120], ['diastolic_bp', '<', 80]]})
+    either = compile_rule({'any': [['systolic_bp', '>=', 130], ['diastolic_bp', '>=', 80]]})
+    # Missing values never match
+    assert both(columns).tolist() == [False, False, True, False]
+    assert either(columns).tolist() == [False, True, True, True]
+
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps([{'name': 'fast', 'group': 'heart_rate', 'all': [['heart_rate', '>', 90]]}]))
+    rules = load_rules(str(path))
+    assert [rule['name'] for rule in rules] == ['fast']
+    assert rules[0]['predicate']({'heart_rate': np.array([80.0, 95.0])}).tolist() == [False, True]
+
+
+def test_evaluate_matches_rows_against_every_rule():
+    assert evaluate([]) == []
+    matches = evaluate([(1, 150, 55, 105), (2, 115, 75, None)])
+    assert sorted(matches) == [(1, 'aha_high'), (1, 'high_systolic'), (1, 'hr_high'),
+                               (1, 'low_diastolic'), (2, 'aha_normal')]
+    assert threshold('high_systolic', 'systolic_bp') == 140
+
+
+def test_saving_a_day_re_evaluates_its_alerts(app_module, client):
+    def day_alerts():
+        conn = sqlite3.connect(app_module.DB_PATH)
+        rows = conn.execute("SELECT ts, rule FROM alerts WHERE rule = 'high_systolic'").fetchall()
+        conn.close()
+        return rows
+
+    def save(systolic, version):
+        return client.post('/api/data/2024-01-05', json={
+            'bp_readings': [{'datetime': '2024-01-05 08:00:00', 'systolic': systolic,
+                             'diastolic': 80, 'heart_rate': 70}],
+            'medications': [], 'version': version})
+
+    assert save(150, 0).status_code == 200
+    assert day_alerts() == [(to_epoch('2024-01-05 08:00:00'), 'high_systolic')]
+    # Edited below the limit: the old alert is cleared, not left behind
+    assert save(130, 1).status_code == 200
+    assert day_alerts() == []
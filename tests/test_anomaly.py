@@ -0,0 +1,56 @@
+import random
+import sqlite3
+
+import pytest
+
+from bp.anomaly import remove, update
+
+
+def test_remove_undoes_update():
+    rng = random.Random(2)
+    values = [rng.gauss(120, 10) for _ in range(50)]
+    state = (0, 0.0, 0.0, 0.0)
+    for value in values:
+        _, state = update(state, value)
+    before_last = state
+    _, state = update(state, 150.0)
+    count, mean, m2, _ = remove(state, 150.0)
+    assert count == before_last[0]
+    assert mean == pytest.approx(before_last[1])
+    assert m2 == pytest.approx(before_last[2])
+
+    # Removing an earlier value leaves the statistics of the others
+    count, mean, m2, _ = remove(before_last, values[0])
+    rest = values[1:]
+    rest_mean = sum(rest) / len(rest)
+    assert count == len(rest)
+    assert mean == pytest.approx(rest_mean)
+    assert m2 == pytest.approx(sum((value - rest_mean) ** 2 for value in rest))
+
+
+def state_counts(app_module):
+    conn = sqlite3.connect(app_module.DB_PATH)
+    counts = dict(((metric, slot), count) for metric, slot, count
+                  in conn.execute('SELECT metric, slot, count FROM anomaly_state'))
+    conn.close()
+    return counts
+
+
+def test_saving_a_day_again_keeps_state_counts(app_module, client):
+    def save(systolic, version):
+        response = client.post('/api/data/2024-01-05', json={
+            'bp_readings': [{'datetime': f'2024-01-05 {hour:02d}:00:00', 'systolic': systolic + hour,
+                             'diastolic': 80, 'heart_rate': 70} for hour in (8, 12, 20)],
+            'medications': [], 'version': version})
+        assert response.status_code == 200
+        return response.get_json()['version']
+
+    version = save(120, 0)
+    counts = state_counts(app_module)
+    assert sum(counts.values()) == 9
+
+    # Edited values, then the same values again
+    version = save(130, version)
+    assert state_counts(app_module) == counts
+    save(130, version)
+    assert state_counts(app_module) == counts
@@ -0,0 +1,130 @@
+import json
+import sqlite3
+
+import pytest
+
+
+def test_get_data_rejects_invalid_date(client):
+    response = client.get('/api/data/notadate')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_get_data_empty_day(client):
+    response = client.get('/api/data/2024-01-05')
+    assert response.status_code == 200
+    assert response.get_json() == {'bp_readings': [], 'medications': [], 'version': 0}
+
+
+def test_ingest_starts_queue_on_first_use(app_module, client):
+    # Nothing called start_ingest, as under `flask run` or a WSGI server
+    assert app_module.ingest_queue is None
+    response = client.post('/api/readings', json={'readings': [
+        {'datetime': '2024-01-05 08:00:00', 'systolic': 128, 'diastolic': 82, 'heart_rate': 70}
+    ]})
+    assert response.status_code == 202
+    assert response.get_json()['accepted'] == 1
+
+    app_module.ingest_queue.drain()
+    day = client.get('/api/data/2024-01-05').get_json()
+    assert [row[:4] for row in day['bp_readings']] == [['2024-01-05 08:00:00', 128, 82, 70]]
+    assert day['version'] == 1
+
+
+def test_save_after_ingest_into_edited_day_conflicts(app_module, client):
+    loaded = client.get('/api/data/2024-01-05').get_json()
+
+    # A device uploads a reading for the day while it is open in the editor
+    client.post('/api/readings', json={'readings': [
+        {'datetime': '2024-01-05 08:00:00', 'systolic': 128, 'diastolic': 82, 'heart_rate': 70}
+    ]})
+    app_module.ingest_queue.drain()
+
+    edit = {'bp_readings': [{'datetime': '2024-01-05 09:00:00', 'systolic': 135,
+                             'diastolic': 88, 'heart_rate': 75}],
+            'medications': [], 'version': loaded['version']}
+    response = client.post('/api/data/2024-01-05', json=edit)
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 1
+
+    # The ingested reading survives; saving on top of the reloaded day works
+    day = client.get('/api/data/2024-01-05').get_json()
+    assert [row[0] for row in day['bp_readings']] == ['2024-01-05 08:00:00']
+    edit['version'] = day['version']
+    response = client.post('/api/data/2024-01-05', json=edit)
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 2
+
+
+def test_writes_before_archive_cutoff_are_refused(app_module, client):
+    conn = sqlite3.connect(app_module.DB_PATH)
+    conn.execute("INSERT INTO retention (id, archived_before) VALUES (0, strftime('%s', '2024-02-01'))")
+    conn.commit()
+    conn.close()
+
+    reading = {'datetime': '2024-01-31 08:00:00', 'systolic': 128, 'diastolic': 82, 'heart_rate': 70}
+    response = client.post('/api/data/2024-01-31', json={'bp_readings': [reading], 'medications': [],
+                                                          'version': 0})
+    assert response.status_code == 400
+    assert 'archived' in response.get_json()['error']
+    assert client.post('/api/readings', json={'readings': [reading]}).status_code == 400
+
+    # The queue's writer drops them too (e.g. archived while queued)
+    assert app_module.ingest_rows(sqlite3.connect(app_module.DB_PATH), [(1706688000, 128, 82, 70)]) == []
+
+    reading['datetime'] = '2024-02-01 08:00:00'
+    response = client.post('/api/data/2024-02-01', json={'bp_readings': [reading], 'medications': [],
+                                                          'version': 0})
+    assert response.status_code == 200
+
+
+def test_failed_save_rolls_back_and_releases_the_write_lock(app_module, client, monkeypatch):
+    def fail(cursor, starts):
+        raise RuntimeError('refresh failed')
+    monkeypatch.setattr(app_module, 'refresh_months', fail)
+    payload = {'bp_readings': [{'datetime': '2024-01-05 08:00:00', 'systolic': 128,
+                                'diastolic': 82, 'heart_rate': 70}],
+               'medications': [], 'version': 0}
+    assert client.post('/api/data/2024-01-05', json=payload).status_code == 500
+    assert client.get('/api/data/2024-01-05').get_json()['bp_readings'] == []
+
+    # Another writer gets the lock at once
+    conn = sqlite3.connect(app_module.DB_PATH, timeout=0)
+    conn.execute('BEGIN IMMEDIATE')
+    conn.rollback()
+    conn.close()
+
+
+def test_ingest_sets_aside_entries_that_cannot_be_written(tmp_path):
+    from bp.ingest import IngestQueue, IngestStopped
+
+    def write(conn, rows):
+        if any(row[1] is None for row in rows):
+            raise TypeError('no systolic value')
+        conn.executemany('INSERT INTO blood_pressure_readings (ts, systolic_bp) VALUES (?, ?)', rows)
+
+    db_path = str(tmp_path / 'ingest.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE blood_pressure_readings (ts INTEGER PRIMARY KEY, systolic_bp INTEGER)')
+    conn.close()
+    log_path = str(tmp_path / 'ingest.log')
+    ingest = IngestQueue(db_path, log_path, write)
+    with pytest.raises(IngestStopped):
+        ingest.submit([(1, 120)])
+    ingest.start()
+
+    ingest.submit([(1, 120)])
+    ingest.submit([(2, None)])
+    ingest.submit([(3, 130)])
+    ingest.drain()
+    # The writer survived the bad entry and committed the others around it
+    assert ingest.thread.is_alive()
+    ingest.submit([(4, 140)])
+    ingest.drain()
+
+    conn = sqlite3.connect(db_path)
+    assert [row[0] for row in conn.execute('SELECT ts FROM blood_pressure_readings')] == [1, 3, 4]
+    assert conn.execute('SELECT last_seq FROM ingest_state').fetchone()[0] == 4
+    conn.close()
+    with open(log_path + '.rejected', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'seq': 2, 'rows': [[2, None]]}]
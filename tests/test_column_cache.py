@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+
+from bp.column_cache import load_cache
+from bp.db_schema import ensure_schema, to_epoch
+
+
+def make_db(path, days=20):
+    conn = sqlite3.connect(path)
+    ensure_schema(conn)
+    conn.executemany('INSERT INTO blood_pressure_readings VALUES (?, ?, ?, ?)',
+                     [(to_epoch(f'2024-01-{day + 1:02d} 08:00'), 120 + day, 80, 70) for day in range(days)])
+    conn.commit()
+    conn.close()
+
+
+def count_readings(db_path, cache_dir, results):
+    for _ in range(5):
+        results.put(len(load_cache(db_path, cache_dir)['readings']['ts']))
+
+
+def test_concurrent_processes_share_one_build(tmp_path):
+    db_path = str(tmp_path / 'bp.db')
+    cache_dir = str(tmp_path / 'cache')
+    make_db(db_path)
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=count_readings, args=(db_path, cache_dir, results))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert sorted(results.get() for _ in range(20)) == [20] * 20
+    # One finished version, no builds left behind
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_new_version_replaces_old(tmp_path):
+    db_path = str(tmp_path / 'bp.db')
+    cache_dir = str(tmp_path / 'cache')
+    make_db(db_path, days=5)
+    old = load_cache(db_path, cache_dir)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('INSERT INTO blood_pressure_readings VALUES (?, 130, 85, 72)', (to_epoch('2024-02-01 08:00'),))
+    conn.commit()
+    conn.close()
+
+    new = load_cache(db_path, cache_dir)
+    assert len(new['readings']['ts']) == 6
+    # Arrays mapped before the rebuild stay readable
+    assert len(old['readings']['ts']) == 5
+    assert os.listdir(cache_dir) == [os.path.basename(new['path'])]
+
+
+def test_fit_survives_its_version_being_pruned(tmp_path):
+    from bp.dose_response import RESULT_FILE, load_fit
+
+    db_path = str(tmp_path / 'bp.db')
+    make_db(db_path)
+    cache = load_cache(db_path, str(tmp_path / 'cache'))
+    saved = load_fit(cache)
+    assert os.listdir(cache['path']).count(RESULT_FILE) == 1
+    assert not [name for name in os.listdir(cache['path']) if name.endswith('.tmp')]
+
+    # The arrays stay mapped after a newer version prunes the directory
+    shutil.rmtree(cache['path'])
+    assert load_fit(cache) == saved
@@ -0,0 +1,74 @@
+import json
+import sqlite3
+from datetime import datetime, time
+
+import pandas as pd
+
+from bp.db_schema import to_epoch
+from bp.importer import (BAD_DOSAGE, BAD_TIME, MEDICATIONS, NON_NUMERIC, NOT_INTEGER, OUT_OF_RANGE,
+                         PULSE_PRESSURE, import_workbook, sheet_rows, validate)
+
+NAMES = ['收缩压', '舒张压', '心跳', '坎地沙坦', '乐卡地平', '美托洛尔']
+
+
+def sheet(days):
+    """A DataFrame laid out like read_excel's: {date: {time: six cells}}"""
+    times = sorted({slot for cells in days.values() for slot in cells}, key=str)
+    columns = ['time']
+    for day in days:
+        # read_excel makes repeated headers unique; only the first of each block is a date
+        columns.extend([day] + [f'{day}.{j}' for j in range(1, 6)])
+    rows = [[None] + NAMES * len(days)]
+    for slot in times:
+        row = [slot]
+        for cells in days.values():
+            row.extend(cells.get(slot, [None] * 6))
+        rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_validate_quarantines_every_failed_check():
+    df = sheet({datetime(2024, 1, 1): {
+        time(8): [120, 80, 70, 1, None, None],
+        time(9): ['abc', 80, None, None, None, None],
+        time(10): [300, 80, 70.5, None, None, None],
+        time(11): [80, 90, None, None, 0, None],
+        '25:99': [120, 80, None, None, None, 'two'],
+    }})
+    readings, medications, quarantine = validate(*sheet_rows(df))
+
+    at = to_epoch('2024-01-01 08:00:00')
+    assert readings == [(at, 120, 80, 70)]
+    assert medications == [(at, MEDICATIONS[0], 1.0)]
+    reasons = {(ts, kind): reasons.split(',') for ts, kind, reasons, _ in quarantine}
+    assert reasons == {
+        (at + 3600, 'reading'): [NON_NUMERIC],
+        (at + 7200, 'reading'): [NOT_INTEGER, OUT_OF_RANGE],
+        (at + 10800, 'reading'): [PULSE_PRESSURE],
+        (at + 10800, MEDICATIONS[1]): [BAD_DOSAGE],
+        (None, 'reading'): [BAD_TIME],
+        (None, MEDICATIONS[2]): [BAD_TIME, NON_NUMERIC],
+    }
+    # The original cells are kept as text
+    cells = {(ts, kind): json.loads(cells) for ts, kind, _, cells in quarantine}
+    assert cells[(at + 3600, 'reading')] == ['abc', '80', None]
+
+
+def test_import_stores_clean_rows_and_quarantine(tmp_path, monkeypatch):
+    df = sheet({datetime(2024, 1, 1): {time(8): [120, 80, 70, 1, None, None],
+                                       time(9): [120, 130, None, None, None, None]},
+                datetime(2024, 1, 2): {time(8): [125, 85, None, -1, None, None]}})
+    monkeypatch.setattr(pd, 'read_excel', lambda source: df)
+    db_path = str(tmp_path / 'bp.db')
+    import_workbook('source.xlsx', db_path)
+    # Importing again adds nothing but another quarantine record
+    import_workbook('source.xlsx', db_path)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT ts, systolic_bp FROM blood_pressure_readings').fetchall() == [
+        (to_epoch('2024-01-01 08:00:00'), 120), (to_epoch('2024-01-02 08:00:00'), 125)]
+    assert conn.execute('SELECT kind, reasons FROM quarantine WHERE source = ? ORDER BY id',
+                        ('source.xlsx',)).fetchall() == [
+        ('reading', PULSE_PRESSURE), (MEDICATIONS[0], BAD_DOSAGE)] * 2
+    conn.close()
+
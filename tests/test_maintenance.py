@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import sys
+from datetime import date
+
+import pytest
+
+from bp.daily_index import load_daily_index, window_stats
+from bp.db_schema import to_epoch
+from bp.maintenance import maintain
+from bp.profile_cube import load_profile
+
+# Keeps 2024-07 onwards of the synthetic year
+KEEP_DAYS = (date.today() - date(2024, 7, 15)).days
+
+
+def anomaly_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    counts = dict(((metric, slot), count) for metric, slot, count
+                  in conn.execute('SELECT metric, slot, count FROM anomaly_state'))
+    conn.close()
+    return counts
+
+
+def summary(db_path):
+    """Everything maintenance must leave unchanged: daily totals, stats and the profile"""
+    conn = sqlite3.connect(db_path)
+    index = load_daily_index(conn)
+    result = (index, window_stats(index, 0, len(index['dates'])),
+              load_profile(conn.cursor(), '2024-01-01', '2024-12-30'))
+    conn.close()
+    return result
+
+
+def test_maintain_archives_old_months_and_keeps_totals(synthetic_db, tmp_path):
+    pytest.importorskip('pyarrow')
+    before = summary(synthetic_db)
+    maintain(KEEP_DAYS, str(tmp_path / 'archive'), synthetic_db)
+    assert summary(synthetic_db) == before
+
+    conn = sqlite3.connect(synthetic_db)
+    cutoff = to_epoch('2024-07-01')
+    assert conn.execute('SELECT archived_before FROM retention').fetchone()[0] == cutoff
+    assert conn.execute('SELECT MIN(ts) FROM blood_pressure_readings').fetchone()[0] >= cutoff
+    assert conn.execute('SELECT COUNT(*) FROM alerts WHERE ts < ?', (cutoff,)).fetchone()[0] == 0
+    # One summary per archived day
+    assert conn.execute('SELECT COUNT(*) FROM daily_summaries').fetchone()[0] == 182
+    conn.close()
+    months = os.listdir(tmp_path / 'archive' / 'readings' / 'patient=default')
+    assert sorted(months) == [f'month=2024-0{month}' for month in range(1, 7)]
+
+    # Nothing left to archive the second time
+    maintain(KEEP_DAYS, str(tmp_path / 'archive'), synthetic_db)
+    assert summary(synthetic_db) == before
+
+
+def test_maintain_without_pyarrow_skips_archiving(synthetic_db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    monkeypatch.delitem(sys.modules, 'bp.parquet_archive', raising=False)
+    before = summary(synthetic_db)
+    maintain(KEEP_DAYS, str(tmp_path / 'archive'), synthetic_db)
+    assert 'Not archiving' in capsys.readouterr().out
+    assert summary(synthetic_db) == before
+    assert not os.path.exists(tmp_path / 'archive')
+
+
+def test_archive_round_trip_keeps_anomaly_state(synthetic_db, tmp_path):
+    pytest.importorskip('pyarrow')
+    from bp.parquet_archive import import_archive
+
+    before = anomaly_counts(synthetic_db)
+    maintain(KEEP_DAYS, str(tmp_path / 'archive'), synthetic_db)
+    assert anomaly_counts(synthetic_db) == before
+
+    counts = import_archive(str(tmp_path / 'archive'), db_path=synthetic_db)
+    assert counts['readings'] > 0
+    assert anomaly_counts(synthetic_db) == before
+
+    # Restored readings are scored again
+    conn = sqlite3.connect(synthetic_db)
+    unscored = conn.execute('''
+        SELECT COUNT(*) FROM blood_pressure_readings r
+        WHERE NOT EXISTS (SELECT 1 FROM anomaly_scores s WHERE s.ts = r.ts)
+    ''').fetchone()[0]
+    conn.close()
+    assert unscored == 0
@@ -0,0 +1,134 @@
+import random
+import sqlite3
+
+import pytest
+
+from bp.medication_schedule import (MAX_GAP_DAYS, MIN_RUN_DAYS, SECONDS_PER_DAY, create_schedule_tables,
+                                    encode, load_doses, merge_doses, replace_days, set_doses)
+
+MORNING = 8 * 3600
+NAMES = ['Candesartan', 'Metoprolol']
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    create_schedule_tables(cursor)
+    yield cursor
+    conn.close()
+
+
+def daily(first_day, last_day, name='Candesartan', dosage=8.0, time_of_day=MORNING):
+    return [(day * SECONDS_PER_DAY + time_of_day, name, dosage) for day in range(first_day, last_day + 1)]
+
+
+def count(cursor, table):
+    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+    return cursor.fetchone()[0]
+
+
+def test_encode_bridges_gap_of_max_gap_days():
+    gap = range(MIN_RUN_DAYS, MIN_RUN_DAYS + MAX_GAP_DAYS)
+    doses = [dose for dose in daily(0, 2 * MIN_RUN_DAYS + MAX_GAP_DAYS - 1)
+             if dose[0] // SECONDS_PER_DAY not in gap]
+    schedules, exceptions = encode(doses)
+    assert schedules == [('Candesartan', MORNING, 8.0, 0, 2 * MIN_RUN_DAYS + MAX_GAP_DAYS - 1)]
+    assert exceptions == [(day * SECONDS_PER_DAY + MORNING, 'Candesartan', None) for day in gap]
+
+
+def test_encode_splits_at_gap_longer_than_max_gap_days():
+    gap = range(MIN_RUN_DAYS, MIN_RUN_DAYS + MAX_GAP_DAYS + 1)
+    last = 2 * MIN_RUN_DAYS + MAX_GAP_DAYS
+    doses = [dose for dose in daily(0, last) if dose[0] // SECONDS_PER_DAY not in gap]
+    schedules, exceptions = encode(doses)
+    assert sorted(schedules) == [('Candesartan', MORNING, 8.0, 0, MIN_RUN_DAYS - 1),
+                                 ('Candesartan', MORNING, 8.0, gap[-1] + 1, last)]
+    assert exceptions == []
+
+
+def test_encode_short_run_becomes_exceptions():
+    doses = daily(0, MIN_RUN_DAYS - 2)
+    assert encode(doses) == ([], doses)
+
+
+def test_merge_doses_without_replace_keeps_existing(cursor):
+    merge_doses(cursor, daily(0, 29))
+    existing = (5 * SECONDS_PER_DAY + MORNING, 'Candesartan', 16.0)
+    added = (5 * SECONDS_PER_DAY + MORNING, 'Metoprolol', 25.0)
+    assert merge_doses(cursor, [existing, added], replace=False) == [added]
+
+    doses = load_doses(cursor, 5 * SECONDS_PER_DAY, 6 * SECONDS_PER_DAY)
+    assert doses == [(5 * SECONDS_PER_DAY + MORNING, 'Candesartan', 8.0), added]
+    # Replacing does change it
+    assert merge_doses(cursor, [existing]) == [existing]
+    assert load_doses(cursor, 5 * SECONDS_PER_DAY, 6 * SECONDS_PER_DAY)[0] == existing
+
+
+def test_saving_one_day_of_a_long_regimen_stays_local(cursor):
+    merge_doses(cursor, daily(0, 3 * 365))
+    assert count(cursor, 'medication_schedules') == 1
+
+    # Unchanged: the schedule is cut around the day and joined again
+    set_doses(cursor, 500, 500, daily(500, 500))
+    assert count(cursor, 'medication_schedules') == 1
+    assert count(cursor, 'medication_exceptions') == 0
+
+    # A skipped dose in the middle becomes one exception of the same schedule
+    set_doses(cursor, 600, 600, [])
+    assert count(cursor, 'medication_schedules') == 1
+    assert load_doses(cursor) == [dose for dose in daily(0, 3 * 365) if dose[0] // SECONDS_PER_DAY != 600]
+
+    # A changed dosage for a few weeks splits it in three
+    set_doses(cursor, 700, 720, daily(700, 720, dosage=16.0))
+    assert count(cursor, 'medication_schedules') == 3
+
+
+def test_random_edits_match_dict_model(cursor):
+    rng = random.Random(49)
+    model = {}
+    days = 120
+
+    def random_doses(first_day, last_day):
+        doses = []
+        dosage = rng.choice([4.0, 8.0])
+        for day in range(first_day, last_day + 1):
+            for name in NAMES:
+                if rng.random() < 0.1:
+                    dosage = rng.choice([4.0, 8.0, 16.0])
+                if rng.random() < 0.85:
+                    doses.append((day * SECONDS_PER_DAY + MORNING, name, dosage))
+        return doses
+
+    for step in range(200):
+        action = rng.random()
+        first_day = rng.randrange(days)
+        last_day = min(days - 1, first_day + rng.choice([0, 0, 1, 3, 10, 40]))
+        if action < 0.5:
+            doses = random_doses(first_day, last_day)
+            set_doses(cursor, first_day, last_day, doses)
+            for key in [key for key in model if first_day <= key[0] // SECONDS_PER_DAY <= last_day]:
+                del model[key]
+            model.update({(ts, name): dosage for ts, name, dosage in doses})
+        elif action < 0.8:
+            chosen = sorted(rng.sample(range(days), rng.randrange(1, 6)))
+            by_day = {day: random_doses(day, day) for day in chosen}
+            replace_days(cursor, by_day)
+            for key in [key for key in model if key[0] // SECONDS_PER_DAY in by_day]:
+                del model[key]
+            model.update({(ts, name): dosage for doses in by_day.values() for ts, name, dosage in doses})
+        else:
+            replace = rng.random() < 0.5
+            doses = random_doses(first_day, last_day)
+            merge_doses(cursor, doses, replace=replace)
+            for ts, name, dosage in doses:
+                if replace or (ts, name) not in model:
+                    model[ts, name] = dosage
+
+        expected = [(ts, name, dosage) for (ts, name), dosage in sorted(model.items())]
+        assert load_doses(cursor) == expected, step
+        start = rng.randrange(days) * SECONDS_PER_DAY
+        end = start + rng.randrange(1, 30) * SECONDS_PER_DAY
+        assert load_doses(cursor, start, end) == [dose for dose in expected if start <= dose[0] < end]
+        cursor.execute('SELECT MIN(valid_to - valid_from + 1) FROM medication_schedules')
+        assert (cursor.fetchone()[0] or MIN_RUN_DAYS) >= MIN_RUN_DAYS
@@ -0,0 +1,20 @@
+from bp import metrics
+
+
+def statement_count(label):
+    entry = metrics.statement_seconds.values.get((label,))
+    return entry[2] if entry else 0
+
+
+def test_iterating_a_cursor_records_the_statement():
+    conn = metrics.connect(':memory:')
+    conn.execute('CREATE TABLE samples (value INTEGER)')
+    conn.executemany('INSERT INTO samples VALUES (?)', [(value,) for value in range(3)])
+    before = statement_count('SELECT samples')
+
+    cursor = conn.execute('SELECT value FROM samples ORDER BY value')
+    assert [row[0] for row in cursor] == [0, 1, 2]
+    # Recorded once the rows ran out, not only at the next statement or close
+    assert cursor.sql is None
+    assert statement_count('SELECT samples') == before + 1
+    conn.close()
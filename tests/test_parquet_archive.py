@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from bp.db_schema import ensure_schema
+from bp.medication_schedule import load_doses
+
+pytest.importorskip('pyarrow')
+
+
+def table_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    readings = conn.execute('SELECT * FROM blood_pressure_readings ORDER BY ts').fetchall()
+    alerts = conn.execute('SELECT ts, rule FROM alerts ORDER BY ts, rule').fetchall()
+    doses = load_doses(conn.cursor())
+    conn.close()
+    return readings, alerts, doses
+
+
+def test_export_import_round_trip(synthetic_db, tmp_path):
+    from bp.parquet_archive import export_archive, import_archive
+
+    counts = export_archive(str(tmp_path / 'archive'), 'p1', synthetic_db)
+    readings, alerts, doses = table_rows(synthetic_db)
+    assert counts == {'readings': len(readings), 'medications': len(doses)}
+    # One file per month
+    assert len(list((tmp_path / 'archive' / 'readings' / 'patient=p1').iterdir())) == 12
+
+    copy = str(tmp_path / 'copy.db')
+    conn = sqlite3.connect(copy)
+    ensure_schema(conn)
+    conn.close()
+    # Only the requested patient's partitions are read
+    assert import_archive(str(tmp_path / 'archive'), 'p2', copy) == {'readings': 0, 'medications': 0}
+    assert import_archive(str(tmp_path / 'archive'), 'p1', copy) == counts
+    assert table_rows(copy) == (readings, alerts, doses)
+
+    # Importing again replaces rather than duplicates
+    import_archive(str(tmp_path / 'archive'), 'p1', copy)
+    assert table_rows(copy) == (readings, alerts, doses)
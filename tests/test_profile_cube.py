@@ -0,0 +1,60 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from bp.db_schema import to_epoch
+from bp.profile_cube import METRICS, SLOT_SECONDS, empty_profile, load_profile, rebuild_profile_cube
+
+
+def scanned_profile(conn, start, end, weekdays=None):
+    """load_profile() computed the slow way, from every reading in the span"""
+    profile = empty_profile()
+    rows = conn.execute('SELECT ts, systolic_bp, diastolic_bp, heart_rate FROM blood_pressure_readings '
+                        'WHERE ts >= ? AND ts < ?', (to_epoch(start), to_epoch(end) + 86400))
+    for ts, *values in rows:
+        # strftime('%w'): 0 = Sunday
+        if weekdays is not None and (datetime.fromtimestamp(ts, timezone.utc).weekday() + 1) % 7 not in weekdays:
+            continue
+        slot = ts % 86400 // SLOT_SECONDS
+        for metric, value in zip(METRICS, values):
+            if value is None:
+                continue
+            totals = profile[metric]
+            totals['count'][slot] += 1
+            totals['sum'][slot] += value
+            totals['sumsq'][slot] += value * value
+            totals['min'][slot] = value if totals['min'][slot] is None else min(totals['min'][slot], value)
+            totals['max'][slot] = value if totals['max'][slot] is None else max(totals['max'][slot], value)
+    return profile
+
+
+@pytest.mark.parametrize('start, end, weekdays', [
+    ('2024-01-15', '2024-04-10', None),    # partial months at both ends
+    ('2024-02-01', '2024-03-31', None),    # whole months only
+    ('2024-03-03', '2024-03-20', None),    # inside one month
+    ('2024-01-15', '2024-04-10', [0, 6]),
+])
+def test_profile_matches_a_scan_of_the_readings(synthetic_db, start, end, weekdays):
+    conn = sqlite3.connect(synthetic_db)
+    assert load_profile(conn.cursor(), start, end, weekdays) == scanned_profile(conn, start, end, weekdays)
+    conn.close()
+
+
+def test_save_refreshes_the_months_it_changed(synthetic_db, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'DB_PATH', synthetic_db)
+    client = app_module.app.test_client()
+    day = client.get('/api/data/2024-03-05').get_json()
+    response = client.post('/api/data/2024-03-05', json={
+        'bp_readings': [{'datetime': '2024-03-05 07:00:00', 'systolic': 250, 'diastolic': 40,
+                         'heart_rate': None}],
+        'medications': [], 'version': day['version']})
+    assert response.status_code == 200
+
+    conn = sqlite3.connect(synthetic_db)
+    profile = load_profile(conn.cursor(), '2024-03-01', '2024-03-31')
+    assert profile['systolic_bp']['max'][7 * 3600 // SLOT_SECONDS] == 250
+    cells = conn.execute('SELECT * FROM profile_cube ORDER BY month, weekday, slot').fetchall()
+    rebuild_profile_cube(conn)
+    assert conn.execute('SELECT * FROM profile_cube ORDER BY month, weekday, slot').fetchall() == cells
+    conn.close()